@@ -95,6 +95,24 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+API_RESPONSE_CACHE = 'default'
+API_RESPONSE_CACHE_TIMEOUT = 300
+IDEMPOTENCY_KEY_TIMEOUT = 60 * 60 * 24
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -146,11 +164,70 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
 SPECTACULAR_SETTINGS = {
     "COMPONENT_SPLIT_REQUEST": True,
+    "PREPROCESSING_HOOKS": ["core.schema.unescape_path_dots"],
 }
 
+RECIPE_BULK_MAX = 100
+
+# Worker processes rendering image variants; 0 renders them inline
+IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS', 2))
+
+# Chunked recipe image uploads, kept outside MEDIA_ROOT until complete
+IMAGE_UPLOAD_TEMP_DIR = os.environ.get(
+    'IMAGE_UPLOAD_TEMP_DIR',
+    '/vol/web/uploads',
+)
+IMAGE_UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+IMAGE_UPLOAD_MAX_CHUNK_BYTES = 2 * 1024 * 1024
+# The image header must lie within this many bytes from the start
+IMAGE_UPLOAD_HEADER_BYTES = 64 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+IMAGE_UPLOAD_EXPIRY = 60 * 60 * 24
+
+# On-demand resized recipe images, cached on disk up to a byte budget
+IMAGE_RESIZE_CACHE_DIR = os.environ.get(
+    'IMAGE_RESIZE_CACHE_DIR',
+    '/vol/web/resized',
+)
+IMAGE_RESIZE_CACHE_BYTES = int(
+    os.environ.get('IMAGE_RESIZE_CACHE_BYTES', 512 * 1024 * 1024)
+)
+IMAGE_RESIZE_SIZES = [
+    (120, 120),
+    (240, 240),
+    (480, 480),
+    (960, 960),
+    (1200, 1200),
+]
+
+# Hand media files to the web server instead of streaming them from the
+# app: 'X-Accel-Redirect' (nginx, with an internal location mapping
+# MEDIA_ACCEL_REDIRECT_PREFIX to MEDIA_ROOT) or 'X-Sendfile'
+MEDIA_SENDFILE_HEADER = os.environ.get('MEDIA_SENDFILE_HEADER', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get(
+    'MEDIA_ACCEL_REDIRECT_PREFIX',
+    '/protected-media/',
+)
+
+BATCH_MAX_REQUESTS = 20
+
+OPENAPI_SCHEMA_FILE = os.environ.get(
+    'OPENAPI_SCHEMA_FILE',
+    '/vol/web/openapi.yml',
+)
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
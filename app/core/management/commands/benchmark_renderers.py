@@ -0,0 +1,63 @@
+"""
+Django command to benchmark the API JSON renderers on a recipe list payload.
+"""
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import ORJSONRenderer
+
+
+RENDERERS = [
+    ('drf-json', JSONRenderer),
+    ('orjson', ORJSONRenderer),
+]
+
+
+def build_payload(items):
+    """Build a payload shaped like a page of the recipe list"""
+    return [
+        {
+            'id': i,
+            'title': f'Recipe number {i}',
+            'time_minutes': 5 + i % 120,
+            'price': Decimal(i % 10000) / 100,
+            'link': f'https://example.com/recipes/{i}.pdf',
+            'tags': [
+                {'id': i * 5 + j, 'name': f'Tag {j}'} for j in range(5)
+            ],
+            'ingredients': [
+                {'id': i * 10 + j, 'name': f'Ingredient {j}'}
+                for j in range(10)
+            ],
+        }
+        for i in range(items)
+    ]
+
+
+class Command(BaseCommand):
+    """Django command to compare JSON renderer throughput"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        payload = build_payload(options['items'])
+        repeat = options['repeat']
+
+        for name, renderer_class in RENDERERS:
+            renderer = renderer_class()
+            size = len(renderer.render(payload))
+            start = time.perf_counter()
+            for _ in range(repeat):
+                renderer.render(payload)
+            elapsed = (time.perf_counter() - start) / repeat
+
+            self.stdout.write(
+                f'{name}: {elapsed * 1000:.2f} ms/render, '
+                f'{size} bytes, {size / elapsed / 1e6:.1f} MB/s'
+            )
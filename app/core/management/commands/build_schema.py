@@ -0,0 +1,23 @@
+"""
+Django command to write the OpenAPI schema served by /api/schema/.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.schema import generate_schema
+
+
+class Command(BaseCommand):
+    """Django command to build the OpenAPI schema file"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        path = options['file'] or settings.OPENAPI_SCHEMA_FILE
+        content = generate_schema()
+        with open(path, 'wb') as schema_file:
+            schema_file.write(content)
+
+        self.stdout.write(self.style.SUCCESS(f'Schema written to {path}'))
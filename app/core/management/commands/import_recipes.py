@@ -0,0 +1,258 @@
+"""
+Django command to bulk load recipes for a user from NDJSON or CSV.
+
+Rows are validated and written a chunk at a time. Each chunk is loaded
+with PostgreSQL COPY inside its own transaction, which also records the
+number of rows committed so far, so a failed import can be rerun and
+resume after the last committed chunk.
+"""
+import csv
+import io
+import os
+import time
+from decimal import Decimal
+
+import orjson
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Ingredient, Recipe, RecipeImport, Tag
+from recipe.cache import invalidate_user
+from recipe.streaming import split_csv_list
+
+
+RECIPE_FIELDS = ['title', 'description', 'time_minutes', 'price', 'link']
+
+
+def read_ndjson(source):
+    """Yield every non-blank line of an NDJSON file"""
+    for line in source:
+        if line.strip():
+            yield line
+
+
+def load_ndjson(line):
+    """Decode an NDJSON line into a record"""
+    record = orjson.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError('Expected a JSON object.')
+    return record
+
+
+def load_csv(row):
+    """Turn a CSV row into a record, splitting the list columns"""
+    for key in ('tags', 'ingredients'):
+        row[key] = split_csv_list(row.get(key) or '')
+    return row
+
+
+# Reader yielding a raw item per row, and loader turning one into a record
+FORMATS = {
+    'ndjson': (read_ndjson, load_ndjson),
+    'csv': (csv.DictReader, load_csv),
+}
+
+
+def clean_names(items):
+    """Return the distinct non-blank names from a list of names or dicts"""
+    names = (
+        item['name'] if isinstance(item, dict) else item
+        for item in items or []
+    )
+    return list(dict.fromkeys(
+        name.strip() for name in names if name and name.strip()
+    ))
+
+
+def parse_record(record):
+    """Return the cleaned recipe values, tag names and ingredient names"""
+    values = []
+    for name in RECIPE_FIELDS:
+        field = Recipe._meta.get_field(name)
+        value = record.get(name)
+        if value is None:
+            value = '' if field.blank else None
+        elif isinstance(value, float):
+            # JSON numbers arrive as floats, which DecimalField pads out
+            # to max_digits and then rejects as having too many places
+            value = Decimal(str(value))
+        values.append(field.clean(value, None))
+    tags = clean_names(record.get('tags'))
+    ingredients = clean_names(record.get('ingredients'))
+    for name in tags + ingredients:
+        Tag._meta.get_field('name').run_validators(name)
+
+    return values, tags, ingredients
+
+
+def copy_value(value):
+    """Format a value for COPY's text format"""
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t') \
+        .replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Load rows into a table with a single COPY"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    cursor.copy_expert(
+        f'COPY {quote(table)} ({", ".join(map(quote, columns))}) '
+        f'FROM STDIN',
+        buffer,
+    )
+
+
+class NameResolver:
+    """Map names to ids for one user, creating missing objects in bulk"""
+
+    def __init__(self, model, user):
+        self.model = model
+        self.user = user
+        self.ids = {}
+
+    def resolve(self, names):
+        """Make sure every name has an id, creating the missing ones"""
+        missing = [name for name in dict.fromkeys(names)
+                   if name not in self.ids]
+        if missing:
+            objs = self.model.objects.get_or_create_by_names(
+                self.user, missing,
+            )
+            self.ids.update((obj.name, obj.id) for obj in objs)
+
+
+class Command(BaseCommand):
+    """Django command to import recipes for a user"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True)
+        parser.add_argument('--format', choices=sorted(FORMATS))
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        path = options['path']
+        fmt = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'ndjson'
+        )
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["user"]}.')
+
+        source_name = os.path.abspath(path)
+        done = RecipeImport.objects.filter(
+            user=user, source=source_name,
+        ).values_list('rows', flat=True).first() or 0
+        if done:
+            self.stdout.write(f'Resuming after {done} rows')
+
+        resolvers = {
+            'tags': NameResolver(Tag, user),
+            'ingredients': NameResolver(Ingredient, user),
+        }
+        imported = 0
+        start = time.perf_counter()
+        with open(path, newline='', encoding='utf-8') as source:
+            reader, load = FORMATS[fmt]
+            chunk = []
+            for index, item in enumerate(reader(source), start=1):
+                if index <= done:
+                    continue
+                try:
+                    chunk.append(parse_record(load(item)))
+                except (ValidationError, ValueError, KeyError,
+                        TypeError) as exc:
+                    raise CommandError(f'Row {index}: {exc}')
+                if len(chunk) == chunk_size:
+                    imported += self.load_chunk(
+                        user, chunk, resolvers, source_name, done + imported,
+                    )
+                    self.report(imported, start)
+                    chunk = []
+            if chunk:
+                imported += self.load_chunk(
+                    user, chunk, resolvers, source_name, done + imported,
+                )
+
+        RecipeImport.objects.filter(user=user, source=source_name).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} recipes '
+            f'({self.rate(imported, start):.0f} rows/s)'
+        ))
+
+    def load_chunk(self, user, chunk, resolvers, source_name, done):
+        """Write one chunk of parsed rows in a single transaction
+
+        The progress of the import is recorded in the same transaction,
+        so a resumed import never loads a committed chunk twice.
+        """
+        now = timezone.now()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                'FROM generate_series(1, %s)',
+                [Recipe._meta.db_table, 'id', len(chunk)],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            copy_rows(
+                cursor,
+                Recipe._meta.db_table,
+                [
+                    'id', 'user_id', *RECIPE_FIELDS, 'image_variants',
+                    'updated_at',
+                ],
+                (
+                    [recipe_id, user.id, *values, '{}', now]
+                    for recipe_id, (values, _, _) in zip(ids, chunk)
+                ),
+            )
+
+            for position, field_name in enumerate(resolvers, start=1):
+                resolver = resolvers[field_name]
+                resolver.resolve(
+                    name for row in chunk for name in row[position]
+                )
+                through = getattr(Recipe, field_name).through
+                copy_rows(
+                    cursor,
+                    through._meta.db_table,
+                    ['recipe_id', f'{resolver.model._meta.model_name}_id'],
+                    (
+                        (recipe_id, resolver.ids[name])
+                        for recipe_id, row in zip(ids, chunk)
+                        for name in row[position]
+                    ),
+                )
+
+            RecipeImport.objects.update_or_create(
+                user=user,
+                source=source_name,
+                defaults={'rows': done + len(chunk)},
+            )
+
+        invalidate_user(user.id)
+        return len(chunk)
+
+    def rate(self, rows, start):
+        """Return the rows per second since start"""
+        return rows / max(time.perf_counter() - start, 1e-9)
+
+    def report(self, rows, start):
+        """Print the progress so far"""
+        self.stdout.write(
+            f'{rows} rows imported ({self.rate(rows, start):.0f} rows/s)'
+        )
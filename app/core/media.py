@@ -0,0 +1,122 @@
+"""
+Serving stored files with range, validator and sendfile support.
+
+When MEDIA_SENDFILE_HEADER is set, the file is handed to the web server
+in front of the app (X-Accel-Redirect for nginx, X-Sendfile for Apache
+or lighttpd), which then takes care of range requests itself. Otherwise
+the file is streamed by the app, letting the WSGI server send whole
+files with sendfile(2).
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.regex_helper import _lazy_re_compile
+
+
+# A single byte range; several ranges are answered with the whole file
+RANGE_RE = _lazy_re_compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """Return the (start, stop) byte offsets requested by a Range header
+
+    None means the header should be ignored and the whole file sent.
+    ValueError is raised when the range lies outside the file.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None or match.groups() == ('', ''):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        start, stop = max(size - int(last), 0), size
+    else:
+        start = int(first)
+        stop = min(int(last) + 1, size) if last else size
+    if start >= size or start >= stop:
+        raise ValueError('Range not satisfiable.')
+    return start, stop
+
+
+class FileRange:
+    """File-like reading one byte range of an open file
+
+    It has no fileno(), since gunicorn's sendfile ignores the file
+    position and would send the file from its first byte.
+    """
+
+    def __init__(self, file, start, stop):
+        file.seek(start)
+        self.file = file
+        self.remaining = stop - start
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def sendfile_response(storage, name, content_type):
+    """Return an empty response asking the web server to send the file"""
+    header = settings.MEDIA_SENDFILE_HEADER
+    if header == 'X-Accel-Redirect':
+        location = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+    else:
+        location = storage.path(name)
+
+    response = HttpResponse(content_type=content_type)
+    response[header] = location
+    return response
+
+
+def file_response(request, path, content_type, etag):
+    """Stream a file, or the single byte range the request asks for"""
+    size = os.path.getsize(path)
+    byte_range = None
+    if request.META.get('HTTP_IF_RANGE', etag) == etag:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE', ''), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, stop = byte_range
+        response = FileResponse(
+            FileRange(open(path, 'rb'), start, stop),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Length'] = stop - start
+        response['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_file(request, storage, name, etag, cache_control):
+    """Serve a stored file honouring If-None-Match, If-Range and Range"""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        content_type = mimetypes.guess_type(name)[0] or \
+            'application/octet-stream'
+        if settings.MEDIA_SENDFILE_HEADER:
+            response = sendfile_response(storage, name, content_type)
+        else:
+            response = file_response(
+                request, storage.path(name), content_type, etag,
+            )
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
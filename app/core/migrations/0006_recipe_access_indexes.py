@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'name'], name='ingredient_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name'], name='tag_user_name_idx'),
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX recipe_tags_tag_recipe_idx '
+                'ON core_recipe_tags (tag_id, recipe_id);',
+            reverse_sql='DROP INDEX recipe_tags_tag_recipe_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX recipe_ingredients_ingredient_recipe_idx '
+                'ON core_recipe_ingredients (ingredient_id, recipe_id);',
+            reverse_sql='DROP INDEX recipe_ingredients_ingredient_recipe_idx;',
+        ),
+    ]
@@ -12,9 +12,15 @@ from django.contrib.auth.models import (
     PermissionsMixin
 )
 
+from core.storage import recipe_image_storage
+
 
 def recipe_image_file_path(instance, filename):
-    """Generate file path for new recipe image"""
+    """Generate file path for new recipe image
+
+    The storage replaces the file name with the hash of its content, so
+    only the directory and extension of this name are kept.
+    """
     ext = os.path.splitext(filename)[1]
     filename = f'{uuid.uuid4()}{ext}'
 
@@ -44,6 +50,37 @@ class UserManager(BaseUserManager):
         return user
 
 
+class UserNamedManager(models.Manager):
+    """Manager for objects whose name is unique per user"""
+    def get_or_create_by_names(self, user, names):
+        """Return objects for the names in order, creating missing ones
+
+        Looks every name up in one query and inserts the missing ones in
+        another. Names created concurrently by another request are skipped
+        on insert and picked up by a final lookup.
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return []
+
+        found = {
+            obj.name: obj
+            for obj in self.filter(user=user, name__in=names)
+        }
+        missing = [name for name in names if name not in found]
+        if missing:
+            self.bulk_create(
+                [self.model(user=user, name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            found.update(
+                (obj.name, obj)
+                for obj in self.filter(user=user, name__in=missing)
+            )
+
+        return [found[name] for name in names]
+
+
 class User(AbstractBaseUser, PermissionsMixin):
     """User in the system"""
     email = models.EmailField(max_length=255, unique=True)
@@ -71,12 +108,67 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag', blank=True)
     ingredients = models.ManyToManyField('Ingredient', blank=True)
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=recipe_image_storage,
+    )
+    image_variants = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class ImageUpload(models.Model):
+    """Recipe image being uploaded in chunks"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    size = models.PositiveIntegerField()
+    offset = models.PositiveIntegerField(default=0)
+    image_format = models.CharField(max_length=10, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.id)
+
+
+class ImageBlob(models.Model):
+    """Stored image file and the number of recipes referencing it"""
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeImport(models.Model):
+    """Rows of a file already committed by an unfinished recipe import"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    source = models.CharField(max_length=1024)
+    rows = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'source'],
+                name='unique_import_source_per_user',
+            ),
+        ]
+
+    def __str__(self):
+        return self.source
+
+
 class Tag(models.Model):
     """Tag for a recipe"""
     user = models.ForeignKey(
@@ -84,6 +176,17 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
     name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = UserNamedManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -96,6 +199,17 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = UserNamedManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_name_per_user',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -0,0 +1,21 @@
+"""
+Fast JSON parser for the REST API, backed by orjson.
+"""
+import orjson
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from core.renderers import ORJSONRenderer
+
+
+class ORJSONParser(JSONParser):
+    """Parses JSON-serialized data with orjson"""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Parse the incoming bytestream as JSON and return the data"""
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
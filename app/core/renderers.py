@@ -0,0 +1,50 @@
+"""
+Fast JSON renderer for the REST API, backed by orjson.
+"""
+from decimal import Decimal
+
+import orjson
+
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+_fallback_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    """Encode the types orjson does not serialize the way DRF does"""
+    if isinstance(obj, Decimal):
+        # keep the exact value, DRF's encoder would round-trip via float
+        return str(obj)
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    return _fallback_encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Renderer which serializes to JSON with orjson"""
+    # datetimes are passed through so they are formatted exactly like
+    # DRF's encoder formats them
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render `data` into JSON, returning a bytestring"""
+        if data is None:
+            return b''
+
+        options = self.options
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent:
+            options |= orjson.OPT_INDENT_2
+
+        ret = orjson.dumps(data, default=encode_default, option=options)
+
+        # escape U+2028/U+2029 so the output stays a strict javascript subset
+        return ret.replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
@@ -0,0 +1,48 @@
+"""
+Build-time OpenAPI schema generation and the in-memory frozen copy.
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import quote_etag
+from drf_spectacular.renderers import OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+
+_frozen_schema = None
+
+
+def unescape_path_dots(endpoints):
+    """Show dots escaped in route regexes as plain dots in schema paths"""
+    return [
+        (path.replace('\\.', '.'), path_regex, method, callback)
+        for path, path_regex, method, callback in endpoints
+    ]
+
+
+def generate_schema():
+    """Generate the public OpenAPI schema and render it as YAML"""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    return OpenApiYamlRenderer().render(schema, renderer_context={})
+
+
+def get_frozen_schema():
+    """Return the schema bytes and their ETag, loaded once per process
+
+    The schema is read from OPENAPI_SCHEMA_FILE, written at build time by
+    the build_schema command. When the file is missing the schema is
+    generated once and kept for the life of the process.
+    """
+    global _frozen_schema
+    if _frozen_schema is None:
+        try:
+            with open(settings.OPENAPI_SCHEMA_FILE, 'rb') as schema_file:
+                content = schema_file.read()
+        except FileNotFoundError:
+            content = generate_schema()
+
+        etag = quote_etag(hashlib.sha1(content).hexdigest())
+        _frozen_schema = (content, etag)
+
+    return _frozen_schema
@@ -0,0 +1,34 @@
+"""
+Serializers for the project-wide views.
+"""
+from django.conf import settings
+from rest_framework import serializers
+
+
+class BatchItemSerializer(serializers.Serializer):
+    """Serializer for one sub-request of a batch"""
+    method = serializers.ChoiceField(
+        choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'],
+        default='GET',
+    )
+    path = serializers.CharField(max_length=2048)
+    headers = serializers.DictField(
+        child=serializers.CharField(),
+        required=False,
+    )
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        """Require an absolute path on this host"""
+        if not value.startswith('/') or value.startswith('//'):
+            raise serializers.ValidationError('Must be an absolute path.')
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for a list of sub-requests"""
+    requests = serializers.ListField(
+        child=BatchItemSerializer(),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_REQUESTS,
+    )
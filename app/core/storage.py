@@ -0,0 +1,102 @@
+"""
+Content-addressed file storage for recipe images.
+
+Every distinct upload is stored once, under the SHA-256 of its content.
+ImageBlob rows count the recipes referencing each file, so a file shared
+by several recipes is only removed when its last reference is released.
+"""
+import glob
+import hashlib
+import os
+import re
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+
+# Stored files and the files derived from them start with the hash
+HASHED_NAME_RE = re.compile(r'^([0-9a-f]{64})\.')
+
+
+def content_hash(name):
+    """Return the content hash a stored name starts with, if any"""
+    match = HASHED_NAME_RE.match(os.path.basename(name))
+    return match.group(1) if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Store each distinct file once, named by the hash of its content"""
+
+    def get_available_name(self, name, max_length=None):
+        """Keep the name; _save replaces it with the content hash"""
+        return name
+
+    def _save(self, name, content):
+        """Hash the content while writing it, then file it under its hash
+
+        The blob row is locked while the file is moved into place, so a
+        concurrent release of the same content cannot delete the file
+        between the existence check and the new reference.
+        """
+        directory, ext = os.path.dirname(name), os.path.splitext(name)[1]
+        os.makedirs(self.path(directory), exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.path(directory))
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp_file.write(chunk)
+
+            hexdigest = digest.hexdigest()
+            name = os.path.join(
+                directory, hexdigest[:2], hexdigest + ext.lower(),
+            )
+            path = self.path(name)
+            ImageBlob = apps.get_model('core', 'ImageBlob')
+            with transaction.atomic():
+                blob, _ = ImageBlob.objects.select_for_update() \
+                    .get_or_create(name=name)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(path, self.file_permissions_mode)
+                ImageBlob.objects.filter(pk=blob.pk).update(
+                    refcount=F('refcount') + 1,
+                )
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return name
+
+    def release(self, name):
+        """Drop one reference to a file, deleting it with the last one
+
+        Files derived from the blob, such as image variants, share its
+        name stem and are deleted with it. Files saved before content
+        addressing have no blob row and are deleted on first release.
+        """
+        ImageBlob = apps.get_model('core', 'ImageBlob')
+        with transaction.atomic():
+            blob = ImageBlob.objects.select_for_update() \
+                .filter(name=name).first()
+            if blob is not None and blob.refcount > 1:
+                ImageBlob.objects.filter(pk=blob.pk).update(
+                    refcount=F('refcount') - 1,
+                )
+                return
+
+            if blob is not None:
+                blob.delete()
+            stem = os.path.splitext(self.path(name))[0]
+            for path in glob.glob(glob.escape(stem) + '.*'):
+                os.remove(path)
+
+
+recipe_image_storage = ContentAddressedStorage()
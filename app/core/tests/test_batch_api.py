@@ -0,0 +1,158 @@
+"""
+Tests for the batch API.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+BATCH_URL = reverse('api-batch')
+
+
+class PublicBatchApiTests(TestCase):
+    """Test unauthenticated batch requests"""
+
+    def test_auth_required(self):
+        """Test authentication is required for the batch endpoint"""
+        res = APIClient().post(
+            BATCH_URL,
+            {'requests': [{'path': reverse('user:me')}]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBatchApiTests(TestCase):
+    """Test authenticated batch requests"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+            name='Test User',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def batch(self, *items):
+        """Post a batch and return the list of results"""
+        res = self.client.post(BATCH_URL, {'requests': items}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.json()
+
+    def test_batch_startup_requests(self):
+        """Test the user, tags and recipes are returned in one response"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('2.50'),
+        )
+
+        results = self.batch(
+            {'path': reverse('user:me')},
+            {'path': reverse('recipe:tag-list')},
+            {'path': reverse('recipe:recipe-list') + '?page_size=1'},
+            {'path': reverse('recipe:recipe-detail', args=[recipe.id])},
+        )
+
+        self.assertEqual([r['status'] for r in results], [200] * 4)
+        self.assertEqual(results[0]['body']['email'], 'user@example.com')
+        self.assertEqual(results[1]['body'][0]['name'], 'Vegan')
+        self.assertEqual(results[2]['body']['results'][0]['id'], recipe.id)
+        self.assertEqual(results[3]['body']['price'], '2.50')
+        self.assertIn('ETag', results[3]['headers'])
+
+    def test_batch_write_then_read(self):
+        """Test sub-requests run in order and can write"""
+        results = self.batch(
+            {
+                'method': 'POST',
+                'path': reverse('recipe:recipe-list'),
+                'body': {
+                    'title': 'Bread',
+                    'time_minutes': 60,
+                    'price': '1.00',
+                },
+            },
+            {'path': reverse('recipe:recipe-list')},
+        )
+
+        self.assertEqual(results[0]['status'], status.HTTP_201_CREATED)
+        self.assertEqual(results[1]['body']['results'][0]['title'], 'Bread')
+        self.assertEqual(Recipe.objects.get().user, self.user)
+
+    def test_batch_passes_headers(self):
+        """Test per-item headers such as If-None-Match reach the view"""
+        first = self.batch({'path': reverse('recipe:recipe-list')})[0]
+        etag = first['headers']['ETag']
+
+        result = self.batch({
+            'path': reverse('recipe:recipe-list'),
+            'headers': {'If-None-Match': etag},
+        })[0]
+
+        self.assertEqual(result['status'], status.HTTP_304_NOT_MODIFIED)
+
+    def test_batch_item_errors(self):
+        """Test failing items report their status without failing others"""
+        results = self.batch(
+            {'path': '/api/missing/'},
+            {'path': reverse('recipe:recipe-detail', args=[999])},
+            {'path': BATCH_URL, 'method': 'POST'},
+            {'path': reverse('user:me')},
+        )
+
+        self.assertEqual(
+            [r['status'] for r in results],
+            [404, 404, 400, 200],
+        )
+
+    def test_batch_item_exception(self):
+        """Test an item raising an exception does not lose other results"""
+        with self.assertLogs('core.views', level='ERROR'):
+            results = self.batch(
+                {
+                    'method': 'POST',
+                    'path': reverse('recipe:recipe-list'),
+                    'body': {
+                        'title': 'Bread',
+                        'time_minutes': 60,
+                        'price': '1.00',
+                    },
+                },
+                {'path': reverse('recipe:recipe-list') + '?tags=abc'},
+                {'path': reverse('user:me')},
+            )
+
+        self.assertEqual(
+            [r['status'] for r in results],
+            [201, 500, 200],
+        )
+        self.assertEqual(results[0]['body']['title'], 'Bread')
+        self.assertTrue(Recipe.objects.filter(title='Bread').exists())
+
+    def test_batch_validation(self):
+        """Test an empty, oversized or malformed batch is rejected"""
+        me = {'path': reverse('user:me')}
+        for payload in (
+            {'requests': []},
+            {'requests': [me] * 21},
+            {'requests': [{'path': 'http://example.com/'}]},
+            {'requests': [{'path': '/api/user/me/', 'method': 'TRACE'}]},
+        ):
+            res = self.client.post(BATCH_URL, payload, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
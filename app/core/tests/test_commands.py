@@ -1,13 +1,22 @@
 """
 Test custom django managements commands.
 """
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as psycopg2_error
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+
+from core.models import Ingredient, Recipe, RecipeImport, Tag
 
 
 @patch("core.management.commands.wait_for_db.Command.check")
@@ -32,3 +41,221 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=["default"])
+
+
+class BenchmarkRenderersCommandTests(SimpleTestCase):
+    """Test the renderer benchmark command"""
+
+    def test_benchmark_reports_each_renderer(self):
+        """Test the benchmark prints a line per renderer"""
+        out = StringIO()
+
+        call_command('benchmark_renderers', items=3, repeat=1, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('drf-json:', output)
+        self.assertIn('orjson:', output)
+        self.assertIn('MB/s', output)
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Test the recipe import command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write_file(self, name, content):
+        """Write content to a file in the temporary directory"""
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf-8') as source:
+            source.write(content)
+        return path
+
+    def ndjson(self, records):
+        """Return NDJSON lines for the records"""
+        return ''.join(json.dumps(record) + '\n' for record in records)
+
+    def record(self, index, **params):
+        """Return an import record"""
+        record = {
+            'title': f'Recipe {index}',
+            'time_minutes': 10,
+            'price': '5.50',
+            'tags': ['Vegan', 'Quick'],
+            'ingredients': ['Salt'],
+        }
+        record.update(params)
+        return record
+
+    def run_import(self, path, **options):
+        """Run the import and return its output"""
+        out = StringIO()
+        call_command(
+            'import_recipes', path, user=self.user.email, stdout=out,
+            **options,
+        )
+        return out.getvalue()
+
+    def test_import_ndjson(self):
+        """Test importing recipes and deduplicating their tags"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        records = [
+            self.record(1, description='Line one\nline\ttwo \\ end'),
+            self.record(2, tags=[{'name': 'Quick'}, 'Quick']),
+        ]
+        path = self.write_file('recipes.ndjson', self.ndjson(records))
+
+        output = self.run_import(path, chunk_size=1)
+
+        self.assertIn('Imported 2 recipes', output)
+        self.assertIn('rows/s', output)
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(recipes.count(), 2)
+        first, second = recipes
+        self.assertEqual(first.description, 'Line one\nline\ttwo \\ end')
+        self.assertEqual(first.price, Decimal('5.50'))
+        self.assertEqual(first.link, '')
+        self.assertEqual(
+            sorted(first.tags.values_list('name', flat=True)),
+            ['Quick', 'Vegan'],
+        )
+        self.assertEqual(
+            list(second.tags.values_list('name', flat=True)), ['Quick'],
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+        self.assertFalse(RecipeImport.objects.exists())
+
+    def test_import_numeric_values(self):
+        """Test JSON numbers are accepted for decimal fields"""
+        path = self.write_file(
+            'recipes.ndjson',
+            self.ndjson([self.record(1, price=5.1, time_minutes=7)]),
+        )
+
+        self.run_import(path)
+
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.price, Decimal('5.10'))
+        self.assertEqual(recipe.time_minutes, 7)
+
+    def test_import_csv(self):
+        """Test importing recipes from CSV with separated tag names"""
+        path = self.write_file(
+            'recipes.csv',
+            'title,time_minutes,price,link,tags,ingredients\n'
+            'Soup,20,4.00,https://example.com,Warm|Quick,Water|Salt\n'
+            'Bread,90,2.25,,,\n',
+        )
+
+        self.run_import(path)
+
+        soup = Recipe.objects.get(title='Soup')
+        self.assertEqual(soup.time_minutes, 20)
+        self.assertEqual(
+            sorted(soup.ingredients.values_list('name', flat=True)),
+            ['Salt', 'Water'],
+        )
+        bread = Recipe.objects.get(title='Bread')
+        self.assertFalse(bread.tags.exists())
+
+    def test_import_csv_escaped_names(self):
+        """Test escaped separators in CSV list columns stay in the name"""
+        path = self.write_file(
+            'recipes.csv',
+            'title,time_minutes,price,tags\n'
+            'Soup,20,4.00,Salt\\|Pepper|Warm\n',
+        )
+
+        self.run_import(path)
+
+        self.assertEqual(
+            sorted(Recipe.objects.get().tags.values_list('name', flat=True)),
+            ['Salt|Pepper', 'Warm'],
+        )
+
+    def test_import_invalid_row_keeps_committed_chunks(self):
+        """Test a bad row stops the import after the last full chunk"""
+        records = [
+            self.record(1),
+            self.record(2),
+            self.record(3, price='not a price'),
+        ]
+        path = self.write_file('recipes.ndjson', self.ndjson(records))
+
+        with self.assertRaisesMessage(CommandError, 'Row 3'):
+            self.run_import(path, chunk_size=2)
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        checkpoint = RecipeImport.objects.get(user=self.user)
+        self.assertEqual(checkpoint.source, os.path.abspath(path))
+        self.assertEqual(checkpoint.rows, 2)
+
+    def test_import_malformed_rows(self):
+        """Test undecodable and non-object lines report their row"""
+        for line in ['{"title": ', '"just a string"']:
+            with self.subTest(line=line):
+                path = self.write_file(
+                    'recipes.ndjson',
+                    self.ndjson([self.record(1)]) + line + '\n',
+                )
+
+                with self.assertRaisesMessage(CommandError, 'Row 2'):
+                    self.run_import(path)
+
+    def test_import_checkpoint_commits_with_chunk(self):
+        """Test a chunk whose progress cannot be recorded is rolled back"""
+        path = self.write_file(
+            'recipes.ndjson', self.ndjson([self.record(1)]),
+        )
+
+        with patch.object(
+            RecipeImport.objects, 'update_or_create',
+            side_effect=OperationalError,
+        ):
+            with self.assertRaises(OperationalError):
+                self.run_import(path)
+
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_import_resumes_from_checkpoint(self):
+        """Test rerunning an import skips rows already committed"""
+        records = [self.record(1), self.record(2), self.record(3)]
+        path = self.write_file('recipes.ndjson', self.ndjson(records))
+        RecipeImport.objects.create(
+            user=self.user, source=os.path.abspath(path), rows=2,
+        )
+
+        output = self.run_import(path)
+
+        self.assertIn('Resuming after 2 rows', output)
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)),
+            ['Recipe 3'],
+        )
+
+    def test_import_leaves_sequence_usable(self):
+        """Test recipes created after an import get fresh ids"""
+        path = self.write_file(
+            'recipes.ndjson', self.ndjson([self.record(1)]),
+        )
+        self.run_import(path)
+
+        recipe = Recipe.objects.create(
+            user=self.user, title='After', time_minutes=1, price='1.00',
+        )
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertGreater(recipe.id, Recipe.objects.get(title='Recipe 1').id)
+
+    def test_import_unknown_user(self):
+        """Test importing for a missing user fails"""
+        path = self.write_file('recipes.ndjson', '')
+
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', path, user='nobody@example.com')
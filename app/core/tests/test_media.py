@@ -0,0 +1,36 @@
+"""
+Tests for serving stored files.
+"""
+from django.test import SimpleTestCase
+
+from core.media import parse_range
+
+
+class ParseRangeTests(SimpleTestCase):
+    """Test reading Range headers"""
+
+    def test_ranges(self):
+        """Test single byte ranges are turned into offsets"""
+        cases = {
+            'bytes=0-9': (0, 10),
+            'bytes=10-': (10, 100),
+            'bytes=-5': (95, 100),
+            'bytes=-500': (0, 100),
+            'bytes=90-500': (90, 100),
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, 100), expected)
+
+    def test_ignored_ranges(self):
+        """Test missing, malformed and multiple ranges are ignored"""
+        for header in ['', 'bytes=-', 'items=0-9', 'bytes=0-1,5-6']:
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 100))
+
+    def test_unsatisfiable_ranges(self):
+        """Test ranges outside the file raise ValueError"""
+        for header in ['bytes=100-', 'bytes=9-3', 'bytes=-0']:
+            with self.subTest(header=header):
+                with self.assertRaises(ValueError):
+                    parse_range(header, 100)
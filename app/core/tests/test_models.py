@@ -4,6 +4,7 @@ Test for models
 from unittest.mock import patch
 from decimal import Decimal
 
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -95,6 +96,46 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_get_or_create_by_names(self):
+        """Test resolving names creates only the missing objects"""
+        user = create_user()
+        existing = models.Tag.objects.create(user=user, name='Vegan')
+
+        with self.assertNumQueries(3):
+            tags = models.Tag.objects.get_or_create_by_names(
+                user,
+                ['Quick', 'Vegan', 'Quick', 'Cheap'],
+            )
+
+        self.assertEqual(
+            [tag.name for tag in tags],
+            ['Quick', 'Vegan', 'Cheap'],
+        )
+        self.assertEqual(tags[1], existing)
+        self.assertTrue(all(tag.pk for tag in tags))
+        self.assertEqual(models.Tag.objects.filter(user=user).count(), 3)
+
+    def test_get_or_create_by_names_all_existing(self):
+        """Test resolving existing names runs a single query"""
+        user = create_user()
+        models.Ingredient.objects.create(user=user, name='Salt')
+
+        with self.assertNumQueries(1):
+            ingredients = models.Ingredient.objects.get_or_create_by_names(
+                user,
+                ['Salt'],
+            )
+
+        self.assertEqual(ingredients[0].name, 'Salt')
+
+    def test_tag_name_unique_per_user(self):
+        """Test a user cannot have two tags with the same name"""
+        user = create_user()
+        models.Tag.objects.create(user=user, name='Vegan')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Vegan')
+
     @patch('core.models.uuid.uuid4')
     def test_recipe_file_name_uuid(self, mock_uuid):
         """Test generating image path"""
@@ -0,0 +1,82 @@
+"""
+Tests for the JSON renderer and parser
+"""
+import io
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+
+
+class RendererTests(SimpleTestCase):
+    """Test the orjson renderer"""
+
+    def setUp(self):
+        self.renderer = ORJSONRenderer()
+
+    def test_render_decimal_keeps_precision(self):
+        """Test decimals are rendered as exact strings"""
+        data = {'price': Decimal('10.10')}
+
+        self.assertEqual(self.renderer.render(data), b'{"price":"10.10"}')
+
+    def test_render_datetime_matches_drf(self):
+        """Test datetimes are formatted like the default renderer"""
+        data = {'at': datetime(2025, 1, 2, 3, 4, 5, 678901, timezone.utc)}
+
+        self.assertEqual(
+            self.renderer.render(data),
+            JSONRenderer().render(data).replace(b' ', b''),
+        )
+        self.assertEqual(
+            self.renderer.render(data),
+            b'{"at":"2025-01-02T03:04:05.678901Z"}',
+        )
+
+    def test_render_lazy_string(self):
+        """Test lazy translation strings are rendered as text"""
+        data = {'detail': gettext_lazy('Not found.')}
+
+        self.assertEqual(
+            self.renderer.render(data),
+            b'{"detail":"Not found."}',
+        )
+
+    def test_render_none(self):
+        """Test rendering None returns an empty body"""
+        self.assertEqual(self.renderer.render(None), b'')
+
+    def test_render_indent(self):
+        """Test an indent in the media type pretty prints the output"""
+        res = self.renderer.render({'a': 1}, 'application/json; indent=4')
+
+        self.assertEqual(res, b'{\n  "a": 1\n}')
+
+    def test_render_escapes_line_separators(self):
+        """Test U+2028 and U+2029 are escaped"""
+        res = self.renderer.render({'a': '\u2028\u2029'})
+
+        self.assertEqual(res, b'{"a":"\\u2028\\u2029"}')
+
+
+class ParserTests(SimpleTestCase):
+    """Test the orjson parser"""
+
+    def test_parse_json(self):
+        """Test parsing a JSON body"""
+        stream = io.BytesIO(b'{"title": "Cake", "tags": [{"name": "x"}]}')
+
+        data = ORJSONParser().parse(stream)
+
+        self.assertEqual(data, {'title': 'Cake', 'tags': [{'name': 'x'}]})
+
+    def test_parse_invalid_json_raises_error(self):
+        """Test invalid JSON raises a parse error"""
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"title": '))
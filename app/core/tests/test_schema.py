@@ -0,0 +1,80 @@
+"""
+Tests for the frozen OpenAPI schema
+"""
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+
+SCHEMA_URL = reverse('api-schema')
+
+
+@patch('core.schema._frozen_schema', None)
+class FrozenSchemaTests(SimpleTestCase):
+    """Test building and serving the precomputed schema"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.schema_file = os.path.join(self.tmp_dir.name, 'openapi.yml')
+        settings_override = override_settings(
+            OPENAPI_SCHEMA_FILE=self.schema_file
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build_schema_writes_file(self):
+        """Test the command writes the OpenAPI schema"""
+        call_command('build_schema', stdout=StringIO())
+
+        with open(self.schema_file, 'rb') as schema_file:
+            content = schema_file.read()
+        self.assertTrue(content.startswith(b'openapi:'))
+        self.assertIn(b'/api/recipe/recipes/', content)
+
+    def test_serves_frozen_file_with_etag(self):
+        """Test the view serves the built file with an ETag"""
+        with open(self.schema_file, 'wb') as schema_file:
+            schema_file.write(b'openapi: 3.0.3\n')
+
+        res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, b'openapi: 3.0.3\n')
+        self.assertIn('ETag', res)
+
+    def test_matching_etag_returns_not_modified(self):
+        """Test a matching If-None-Match returns 304"""
+        with open(self.schema_file, 'wb') as schema_file:
+            schema_file.write(b'openapi: 3.0.3\n')
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+
+    @patch('core.schema.generate_schema', return_value=b'openapi: live\n')
+    def test_schema_is_kept_in_memory(self, patched_generate):
+        """Test the schema is loaded or generated only once"""
+        self.client.get(SCHEMA_URL)
+        res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.content, b'openapi: live\n')
+        patched_generate.assert_called_once_with()
+
+    @override_settings(DEBUG=True)
+    @patch('core.views.get_frozen_schema')
+    def test_debug_generates_live_schema(self, patched_frozen):
+        """Test the schema is generated per request in DEBUG"""
+        res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'/api/recipe/recipes/', res.content)
+        patched_frozen.assert_not_called()
@@ -0,0 +1,80 @@
+"""
+Tests for the content-addressed image storage.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from core.models import ImageBlob
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test storing and releasing files by content hash"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.storage = ContentAddressedStorage(location=self.tmpdir.name)
+
+    def test_file_named_by_content_hash(self):
+        """Test a saved file is named after the hash of its content"""
+        digest = hashlib.sha256(b'photo').hexdigest()
+
+        name = self.storage.save('uploads/recipe/a.JPG', ContentFile(b'photo'))
+
+        self.assertEqual(
+            name, f'uploads/recipe/{digest[:2]}/{digest}.jpg',
+        )
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'photo')
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
+        self.assertEqual(
+            os.listdir(self.storage.path('uploads/recipe')), [digest[:2]],
+        )
+
+    def test_same_content_stored_once(self):
+        """Test identical uploads share one file and count references"""
+        first = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'x'))
+        second = self.storage.save('uploads/recipe/b.jpg', ContentFile(b'x'))
+        other = self.storage.save('uploads/recipe/c.jpg', ContentFile(b'y'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(ImageBlob.objects.get(name=first).refcount, 2)
+
+    def test_release_deletes_with_last_reference(self):
+        """Test a shared file survives until its last release"""
+        name = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'x'))
+        self.storage.save('uploads/recipe/b.jpg', ContentFile(b'x'))
+        variant = os.path.splitext(name)[0] + '.thumb.jpg'
+        with open(self.storage.path(variant), 'wb') as variant_file:
+            variant_file.write(b'thumb')
+
+        self.storage.release(name)
+
+        self.assertTrue(self.storage.exists(name))
+        self.assertTrue(self.storage.exists(variant))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
+
+        self.storage.release(name)
+
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        self.assertFalse(self.storage.exists(name))
+        self.assertEqual(
+            os.listdir(os.path.dirname(self.storage.path(name))), [],
+        )
+
+    def test_release_legacy_file(self):
+        """Test a file saved before content addressing is deleted"""
+        path = self.storage.path('uploads/recipe/legacy.jpg')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as legacy:
+            legacy.write(b'old')
+
+        self.storage.release('uploads/recipe/legacy.jpg')
+
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,158 @@
+"""
+Project-wide views that do not belong to a single API.
+"""
+import io
+import logging
+
+import orjson
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+from drf_spectacular.utils import extend_schema, OpenApiTypes
+from drf_spectacular.views import SpectacularAPIView
+from rest_framework import authentication, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.schema import get_frozen_schema
+from core.serializers import BatchSerializer
+
+
+logger = logging.getLogger(__name__)
+
+# Headers of the batch request that every sub-request inherits
+BATCH_PASSTHROUGH_HEADERS = (
+    'HTTP_HOST',
+    'HTTP_ACCEPT_LANGUAGE',
+    'HTTP_X_FORWARDED_HOST',
+    'HTTP_X_FORWARDED_PROTO',
+)
+
+
+live_schema_view = SpectacularAPIView.as_view()
+
+
+@require_safe
+def schema_view(request, *args, **kwargs):
+    """Serve the frozen OpenAPI schema, generating it live only in DEBUG"""
+    if settings.DEBUG:
+        return live_schema_view(request, *args, **kwargs)
+
+    content, etag = get_frozen_schema()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(
+            content,
+            content_type='application/vnd.oai.openapi',
+        )
+    response['ETag'] = etag
+    return response
+
+
+class BatchView(APIView):
+    """Run several API requests in-process and return every result
+
+    The batch request is authenticated once and its user is forced onto
+    each sub-request, which is dispatched straight to the view resolved
+    from the URLConf on the same database connection.
+    """
+    authentication_classes = [authentication.TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _subrequest(self, request, item):
+        """Build the WSGI request for one batch item"""
+        path, _, query = item['path'].partition('?')
+        body = orjson.dumps(item['body']) if 'body' in item else b''
+        environ = {
+            key: value for key, value in request.META.items()
+            if not key.startswith('HTTP_')
+            and key not in ('CONTENT_TYPE', 'CONTENT_LENGTH')
+        }
+        environ.update(
+            (key, request.META[key]) for key in BATCH_PASSTHROUGH_HEADERS
+            if key in request.META
+        )
+        for name, value in item.get('headers', {}).items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+        environ.update({
+            'REQUEST_METHOD': item['method'],
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+        })
+
+        subrequest = WSGIRequest(environ)
+        subrequest.user = request.user
+        subrequest._force_auth_user = request.user
+        subrequest._force_auth_token = request.auth
+        return subrequest
+
+    def _result(self, response):
+        """Return the status, headers and body of a sub-response"""
+        if response.streaming:
+            return {
+                'status': status.HTTP_400_BAD_REQUEST,
+                'headers': {},
+                'body': {'detail': 'Streaming responses cannot be batched.'},
+            }
+
+        if isinstance(response, Response):
+            body = response.data
+        elif response.get('Content-Type', '').startswith('application/json'):
+            body = orjson.loads(response.content) if response.content else None
+        else:
+            body = response.content.decode(response.charset)
+        return {
+            'status': response.status_code,
+            'headers': dict(response.items()),
+            'body': body,
+        }
+
+    def _dispatch(self, request, item):
+        """Run one batch item and return its result"""
+        try:
+            match = resolve(item['path'].partition('?')[0])
+        except Resolver404:
+            return {
+                'status': status.HTTP_404_NOT_FOUND,
+                'headers': {},
+                'body': {'detail': 'Not found.'},
+            }
+        if getattr(match.func, 'view_class', None) is type(self):
+            return {
+                'status': status.HTTP_400_BAD_REQUEST,
+                'headers': {},
+                'body': {'detail': 'Batches cannot be nested.'},
+            }
+
+        subrequest = self._subrequest(request, item)
+        try:
+            response = match.func(subrequest, *match.args, **match.kwargs)
+            return self._result(response)
+        except Exception:
+            # Earlier items may have committed, so their results must
+            # still reach the client
+            logger.exception(
+                'Batch item %s %s failed', item['method'], item['path'],
+            )
+            return {
+                'status': status.HTTP_500_INTERNAL_SERVER_ERROR,
+                'headers': {},
+                'body': {'detail': 'Internal server error.'},
+            }
+
+    @extend_schema(request=BatchSerializer, responses=OpenApiTypes.OBJECT)
+    def post(self, request):
+        """Run each sub-request in order and return their results"""
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        return Response([
+            self._dispatch(request, item)
+            for item in serializer.validated_data['requests']
+        ])
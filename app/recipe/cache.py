@@ -0,0 +1,65 @@
+"""
+Per-user response cache for the recipe API.
+
+Cached entries are keyed on a per-user generation token. Invalidating a
+user replaces the token, so every entry cached for them becomes
+unreachable without having to find and delete the keys.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def get_cache():
+    """Return the cache backend configured for API responses"""
+    return caches[settings.API_RESPONSE_CACHE]
+
+
+def _generation_key(user_id):
+    """Return the cache key holding the user's generation token"""
+    return f'recipe-api:{user_id}:generation'
+
+
+def user_generation(user_id):
+    """Return the user's current generation token, creating one if needed"""
+    cache = get_cache()
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def _new_generation(user_id):
+    """Replace the user's generation token"""
+    get_cache().set(_generation_key(user_id), uuid.uuid4().hex, None)
+
+
+def invalidate_user(user_id):
+    """Drop every cached response for the user
+
+    Inside a transaction the token is replaced again once it commits:
+    other requests still read the rows from before the change until
+    then, and may cache them under the token replaced up front.
+    """
+    _new_generation(user_id)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _new_generation(user_id))
+
+
+def response_cache_key(request, basename, action):
+    """Return the cache key for a request's response"""
+    params = sorted(
+        (key, sorted(values))
+        for key, values in request.query_params.lists()
+    )
+    digest = hashlib.sha1(
+        repr((request.get_host(), params)).encode()
+    ).hexdigest()
+    generation = user_generation(request.user.pk)
+    return f'recipe-api:{request.user.pk}:{generation}:{basename}:' \
+        f'{action}:{digest}'
@@ -0,0 +1,113 @@
+"""
+Idempotency-Key support for unsafe recipe API requests.
+
+The first request carrying a key runs normally and its response is stored
+under the key for IDEMPOTENCY_KEY_TIMEOUT seconds. Retries with the same
+key get the stored response back without running the view again.
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipe.cache import get_cache
+
+
+IN_PROGRESS = 'in-progress'
+IN_PROGRESS_TIMEOUT = 60
+MAX_KEY_LENGTH = 255
+
+
+def _store_key(user_id, key):
+    """Return the cache key holding the stored response for a key"""
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return f'recipe-api:idempotency:{user_id}:{digest}'
+
+
+def _fingerprint(request):
+    """Return a digest of what identifies the request besides its key
+
+    Multipart bodies are left out, since uploads are streamed to the
+    parsers rather than read into memory; their length stands in for
+    them. Other bodies are small and unread at this point, so they are
+    hashed.
+    """
+    content_type = request.META.get('CONTENT_TYPE', '').split(';')[0]
+    if content_type.startswith('multipart/'):
+        body_digest = None
+    else:
+        body_digest = hashlib.sha1(request.body).hexdigest()
+    return hashlib.sha1(repr((
+        request.method,
+        request.get_full_path(),
+        content_type,
+        request.META.get('CONTENT_LENGTH', ''),
+        body_digest,
+    )).encode()).hexdigest()
+
+
+def _error(detail, status_code):
+    """Return an error response for a key that cannot be used"""
+    return Response({'detail': detail}, status=status_code)
+
+
+def idempotent(view_method):
+    """Replay the stored response when a request repeats its key"""
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get('HTTP_IDEMPOTENCY_KEY')
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return _error(
+                'Invalid Idempotency-Key header.',
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache = get_cache()
+        store_key = _store_key(request.user.pk, key)
+        fingerprint = _fingerprint(request)
+        if not cache.add(store_key, IN_PROGRESS, IN_PROGRESS_TIMEOUT):
+            stored = cache.get(store_key)
+            if stored == IN_PROGRESS:
+                return _error(
+                    'A request with this Idempotency-Key is in progress.',
+                    status.HTTP_409_CONFLICT,
+                )
+            if stored is not None:
+                stored_fingerprint, status_code, data, location = stored
+                if stored_fingerprint != fingerprint:
+                    return _error(
+                        'Idempotency-Key was used for a different request.',
+                        status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                headers = {'Idempotent-Replayed': 'true'}
+                if location:
+                    headers['Location'] = location
+                return Response(data, status=status_code, headers=headers)
+            cache.add(store_key, IN_PROGRESS, IN_PROGRESS_TIMEOUT)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            cache.delete(store_key)
+            raise
+
+        if response.status_code >= 500:
+            cache.delete(store_key)
+        else:
+            cache.set(
+                store_key,
+                (
+                    fingerprint,
+                    response.status_code,
+                    response.data,
+                    response.get('Location'),
+                ),
+                settings.IDEMPOTENCY_KEY_TIMEOUT,
+            )
+        return response
+
+    return wrapper
@@ -0,0 +1,178 @@
+"""
+Image processing for recipe photos.
+
+These functions only touch files, never the database or settings, so
+they can run in a worker process.
+"""
+import io
+import os
+import warnings
+
+from PIL import Image, ImageOps, features
+
+
+# Longest edge, in pixels, of each variant
+VARIANT_SIZES = {
+    'thumb': 120,
+    'medium': 480,
+    'large': 1200,
+}
+JPEG_QUALITY = 85
+
+# Formats resized images can be served in, by extension
+RESIZE_FORMATS = {
+    'jpg': 'JPEG',
+    'png': 'PNG',
+}
+if features.check('webp'):
+    RESIZE_FORMATS['webp'] = 'WEBP'
+
+# Accepted upload formats and the extension they are stored under
+IMAGE_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+}
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+]
+
+
+# Bytes needed to tell every accepted format apart by its magic bytes
+SIGNATURE_BYTES = 12
+
+
+class IncompleteImageHeader(ValueError):
+    """Raised when more bytes are needed to read an image header"""
+
+
+def _signature_format(head):
+    """Return the format named by an image's magic bytes, or None"""
+    for signature, image_format in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+def sniff_image(head):
+    """Return the format and dimensions declared by an image's header
+
+    Only the header is parsed; no pixel data is decoded or allocated, so
+    this is safe to call on a decompression bomb. Raises ValueError when
+    the bytes are not an accepted image format, and IncompleteImageHeader
+    when they may be the start of one that does not hold its header yet.
+    """
+    image_format = _signature_format(head)
+    if image_format is None:
+        if len(head) < SIGNATURE_BYTES:
+            raise IncompleteImageHeader('Image header is incomplete.')
+        raise ValueError('Unsupported image format.')
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        try:
+            with Image.open(io.BytesIO(head), formats=[image_format]) as img:
+                return image_format, img.size
+        except Image.DecompressionBombError:
+            raise ValueError('Image is too large.')
+        except (OSError, SyntaxError):
+            raise IncompleteImageHeader(
+                'Image header is incomplete or invalid.'
+            )
+
+
+def verify_image(path):
+    """Check an image file is complete and well formed
+
+    Raises ValueError for a truncated or corrupt file.
+    """
+    try:
+        with Image.open(path) as img:
+            img.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise ValueError(f'Invalid image: {exc}')
+
+
+def normalize_image(image):
+    """Return an RGB copy upright per its EXIF orientation
+
+    Transparent areas are flattened onto white, since JPEG has no alpha.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def fit_image(image, width, height):
+    """Return a copy fitting in a width x height box, never upscaled"""
+    image = image.copy()
+    image.thumbnail((width, height), Image.LANCZOS)
+    return image
+
+
+def save_jpeg(image, path):
+    """Write an image as a progressive JPEG without any metadata"""
+    image.save(
+        path,
+        format='JPEG',
+        quality=JPEG_QUALITY,
+        optimize=True,
+        progressive=True,
+    )
+
+
+def variant_name(name, variant):
+    """Return the storage name of a variant of an image"""
+    return f'{os.path.splitext(name)[0]}.{variant}.jpg'
+
+
+def render_variants(source_path, name):
+    """Write every variant next to the source and return their names
+
+    Sources are stored by content hash, so variants already on disk are
+    up to date and are not rendered again.
+    """
+    directory = os.path.dirname(source_path)
+    variants = {
+        variant: variant_name(name, variant) for variant in VARIANT_SIZES
+    }
+    paths = {
+        variant: os.path.join(directory, os.path.basename(stored))
+        for variant, stored in variants.items()
+    }
+    missing = [
+        variant for variant, path in paths.items()
+        if not os.path.exists(path)
+    ]
+    if missing:
+        with Image.open(source_path) as source:
+            image = normalize_image(source)
+        for variant in missing:
+            size = VARIANT_SIZES[variant]
+            save_jpeg(fit_image(image, size, size), paths[variant])
+
+    return variants
+
+
+def render_resized(source_path, target_path, width, height, extension):
+    """Write the source scaled to fit width x height in a served format"""
+    with Image.open(source_path) as source:
+        image = fit_image(normalize_image(source), width, height)
+
+    image_format = RESIZE_FORMATS[extension]
+    if image_format == 'JPEG':
+        save_jpeg(image, target_path)
+    elif image_format == 'WEBP':
+        image.save(target_path, format='WEBP', quality=JPEG_QUALITY)
+    else:
+        image.save(target_path, format=image_format, optimize=True)
@@ -0,0 +1,59 @@
+"""
+Reusable viewset behaviour for the recipe API.
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, quote_etag
+from rest_framework.response import Response
+
+from recipe.cache import get_cache, response_cache_key, user_generation
+
+
+class ConditionalGetMixin:
+    """Answer conditional GETs from the user's cache generation token
+
+    Every write to a user's recipes, tags or ingredients replaces the
+    token, so it versions all of their responses in a single cache read.
+    A matching If-None-Match returns 304 before the queryset or serializer
+    run.
+    """
+    def _conditional(self, handler, request, *args, **kwargs):
+        """Run the handler unless the client already has this response"""
+        etag = quote_etag(hashlib.sha1(
+            '\n'.join([
+                str(request.user.pk),
+                user_generation(request.user.pk),
+                request.get_full_path(),
+                request.META.get('HTTP_ACCEPT', ''),
+            ]).encode()
+        ).hexdigest())
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """List objects, honouring If-None-Match"""
+        return self._conditional(super().list, request, *args, **kwargs)
+
+
+class CachedListMixin:
+    """Serve list responses from the per-user response cache"""
+
+    def list(self, request, *args, **kwargs):
+        """List objects, reusing a cached response when there is one"""
+        cache = get_cache()
+        key = response_cache_key(request, self.basename, self.action)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.API_RESPONSE_CACHE_TIMEOUT)
+        return response
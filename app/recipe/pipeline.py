@@ -0,0 +1,76 @@
+"""
+Background processing of uploaded recipe images.
+
+Variants are rendered in a process pool so resizing never runs on the
+request thread. The pool reports back on one of its threads in this
+process, which records the variant names on the recipe.
+"""
+import functools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Recipe
+from recipe.cache import invalidate_user
+from recipe.images import render_variants
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    """Return the process pool, starting it on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+        )
+    return _executor
+
+
+def _save_variants(recipe_id, user_id, name, variants):
+    """Record the variants unless the recipe's image changed meanwhile"""
+    Recipe.objects.filter(pk=recipe_id, image=name).update(
+        image_variants=variants,
+        updated_at=timezone.now(),
+    )
+    invalidate_user(user_id)
+
+
+def _variants_done(recipe_id, user_id, name, future):
+    """Store the result of a finished render"""
+    try:
+        _save_variants(recipe_id, user_id, name, future.result())
+    except Exception:
+        logger.exception('Building image variants for %s failed', name)
+    finally:
+        # runs on the pool's thread, which must not keep a connection
+        connection.close()
+
+
+def schedule_variants(recipe):
+    """Render the recipe image's variants once the upload is committed
+
+    With IMAGE_VARIANT_WORKERS set to 0 the variants are rendered inline,
+    which keeps tests and management commands synchronous.
+    """
+    recipe_id, user_id = recipe.pk, recipe.user_id
+    name, path = recipe.image.name, recipe.image.path
+
+    def submit():
+        if not settings.IMAGE_VARIANT_WORKERS:
+            variants = render_variants(path, name)
+            _save_variants(recipe_id, user_id, name, variants)
+            return
+
+        future = get_executor().submit(render_variants, path, name)
+        future.add_done_callback(functools.partial(
+            _variants_done, recipe_id, user_id, name,
+        ))
+
+    transaction.on_commit(submit)
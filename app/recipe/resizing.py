@@ -0,0 +1,129 @@
+"""
+On-demand resized recipe images with a bounded disk cache.
+
+Resized files are keyed on the stored image name, which is the hash of
+its content, so a cached file never goes stale. Hits refresh the file's
+modification time, and when the cache outgrows IMAGE_RESIZE_CACHE_BYTES
+the least recently used files are deleted. A file lock makes concurrent
+requests for the same missing file wait for a single render, across
+threads and worker processes alike.
+"""
+import fcntl
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+
+from recipe.images import render_resized
+
+
+LOCKS_DIR = 'locks'
+LOCK_STRIPES = 256
+
+
+def cache_path(name, width, height, extension):
+    """Return the cache file for a size of a stored image"""
+    digest = hashlib.sha1(name.encode()).hexdigest()
+    return os.path.join(
+        settings.IMAGE_RESIZE_CACHE_DIR,
+        digest[:2],
+        f'{digest}-{width}x{height}.{extension}',
+    )
+
+
+def _lock_path(path):
+    """Return the lock file guarding a cache file
+
+    Cache files share a fixed set of lock files, so locks never need to
+    be cleaned up.
+    """
+    stripe = int(hashlib.sha1(path.encode()).hexdigest(), 16) % LOCK_STRIPES
+    return os.path.join(
+        settings.IMAGE_RESIZE_CACHE_DIR, LOCKS_DIR, f'{stripe:02x}',
+    )
+
+
+def _open_hit(path):
+    """Open a cached file and mark it recently used
+
+    Raises FileNotFoundError on a miss. The open file stays readable if
+    the entry is evicted while it is being served.
+    """
+    cached = open(path, 'rb')
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return cached
+
+
+def _render(source_path, path, width, height, extension):
+    """Render into a temporary file and move it into the cache"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp')
+    os.close(fd)
+    try:
+        render_resized(source_path, tmp_path, width, height, extension)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def get_resized(source_path, name, width, height, extension):
+    """Return an open file of the resized image, rendering it once"""
+    path = cache_path(name, width, height, extension)
+    try:
+        return _open_hit(path)
+    except FileNotFoundError:
+        pass
+
+    lock_path = _lock_path(path)
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            try:
+                return _open_hit(path)
+            except FileNotFoundError:
+                pass
+            _render(source_path, path, width, height, extension)
+            resized = open(path, 'rb')
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    evict()
+    return resized
+
+
+def evict(budget=None):
+    """Delete the least recently used files until the cache fits"""
+    if budget is None:
+        budget = settings.IMAGE_RESIZE_CACHE_BYTES
+
+    entries = []
+    with os.scandir(settings.IMAGE_RESIZE_CACHE_DIR) as buckets:
+        for bucket in buckets:
+            if not bucket.is_dir() or bucket.name == LOCKS_DIR:
+                continue
+            with os.scandir(bucket.path) as files:
+                for entry in files:
+                    if entry.name.startswith('.tmp'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
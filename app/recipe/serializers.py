@@ -1,8 +1,40 @@
+from django.conf import settings
+from django.db import transaction
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
-from core.models import Recipe, Tag, Ingredient
+from core.models import ImageUpload, Recipe, Tag, Ingredient
+from core.storage import recipe_image_storage
+from recipe.cache import invalidate_user
 
 
-class TagSerializer(serializers.ModelSerializer):
+def set_prefetched(instance, field_name, objs):
+    """Store objs as if prefetch_related() had loaded the relation
+
+    Relies on the private cache Django's prefetch_related() fills in;
+    test_serializers checks it is still honoured.
+    """
+    queryset = getattr(instance, field_name).get_queryset()
+    queryset._result_cache = list(objs)
+    queryset._prefetch_done = True
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[field_name] = queryset
+
+
+class UniqueNameMixin:
+    """Reject renaming an object to a name its user already has"""
+    def validate_name(self, value):
+        """Check the new name is free for the object's user"""
+        instance = self.instance
+        if instance is not None and type(instance).objects.filter(
+            user=instance.user_id,
+            name=value,
+        ).exclude(pk=instance.pk).exists():
+            raise serializers.ValidationError('This name is already in use.')
+        return value
+
+
+class TagSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Serializer for tag objects"""
     class Meta:
         model = Tag
@@ -10,7 +42,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Serializer for ingredient objects"""
     class Meta:
         model = Ingredient
@@ -18,7 +50,61 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Drop the fields not listed in the `fields` keyword argument"""
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Serializer creating many recipes in a constant number of queries"""
+
+    def _link(self, user, recipes, items_per_recipe, model, field_name):
+        """Resolve names for all recipes at once and insert every link"""
+        through = getattr(Recipe, field_name).through
+        column = f'{model._meta.model_name}_id'
+        names_per_recipe = [
+            list(dict.fromkeys(item['name'] for item in items))
+            for items in items_per_recipe
+        ]
+        objs = {
+            obj.name: obj
+            for obj in model.objects.get_or_create_by_names(
+                user,
+                [name for names in names_per_recipe for name in names],
+            )
+        }
+        through.objects.bulk_create(
+            through(recipe_id=recipe.id, **{column: objs[name].id})
+            for recipe, names in zip(recipes, names_per_recipe)
+            for name in names
+        )
+
+    def create(self, validated_data):
+        """Create the recipes, their tags and ingredients in bulk"""
+        tags = [item.pop('tags', []) for item in validated_data]
+        ingredients = [item.pop('ingredients', []) for item in validated_data]
+        user = validated_data[0]['user'] if validated_data else None
+
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(
+                Recipe(**item) for item in validated_data
+            )
+            self._link(user, recipes, tags, Tag, 'tags')
+            self._link(user, recipes, ingredients, Ingredient, 'ingredients')
+
+        # bulk inserts send no model signals
+        if user is not None:
+            invalidate_user(user.pk)
+        return recipes
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for recipe objects"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -30,26 +116,41 @@ class RecipeSerializer(serializers.ModelSerializer):
             'ingredients'
         ]
         read_only_fields = ['id']
+        list_serializer_class = RecipeListSerializer
+
+    def _keep_relation(self, recipe, field_name, objs):
+        """Keep the resolved objects as the recipe's prefetched relation
+
+        The response is then serialized from these objects, in the pk
+        order the read path prefetches them in, instead of querying the
+        relation again. Must run after the last add/remove, which drop
+        the prefetch cache.
+        """
+        set_prefetched(
+            recipe, field_name, sorted(objs, key=lambda obj: obj.pk),
+        )
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """handle creating or getting ingredients"""
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, create = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient
-            )
-            recipe.ingredients.add(ingredient_obj)
+        ingredient_objs = Ingredient.objects.get_or_create_by_names(
+            auth_user,
+            [ingredient['name'] for ingredient in ingredients],
+        )
+        if ingredient_objs:
+            recipe.ingredients.add(*ingredient_objs)
+        self._keep_relation(recipe, 'ingredients', ingredient_objs)
 
     def _get_or_create_tags(self, recipe, tags_data):
         """Handle getting or creating tags"""
         auth_user = self.context['request'].user
-        for tag_data in tags_data:
-            tag, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag_data
-            )
-            recipe.tags.add(tag)
+        tags = Tag.objects.get_or_create_by_names(
+            auth_user,
+            [tag_data['name'] for tag_data in tags_data],
+        )
+        if tags:
+            recipe.tags.add(*tags)
+        self._keep_relation(recipe, 'tags', tags)
 
     def create(self, validated_data):
         """Create a recipe"""
@@ -61,16 +162,38 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    def _set_relation(self, recipe, field_name, model, items):
+        """Link exactly the submitted names, writing only the difference"""
+        manager = getattr(recipe, field_name)
+        names = list(dict.fromkeys(item['name'] for item in items))
+        current = {obj.name: obj for obj in manager.all()}
+        if set(names) == set(current):
+            return
+
+        removed = [obj for name, obj in current.items() if name not in names]
+        if removed:
+            manager.remove(*removed)
+
+        added = model.objects.get_or_create_by_names(
+            self.context['request'].user,
+            [name for name in names if name not in current],
+        )
+        if added:
+            manager.add(*added)
+        self._keep_relation(recipe, field_name, [
+            obj for name, obj in current.items() if name in names
+        ] + added)
+
     def update(self, instance, validated_data):
         """update recipe"""
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(instance, tags)
+            self._set_relation(instance, 'tags', Tag, tags)
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            self._set_relation(
+                instance, 'ingredients', Ingredient, ingredients
+            )
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -79,18 +202,95 @@ class RecipeSerializer(serializers.ModelSerializer):
         return instance
 
 
-class RecipeDetailSerializer(RecipeSerializer):
+class ImageVariantsMixin:
+    """Serialize the stored image variants as URLs"""
+    @extend_schema_field(serializers.DictField(child=serializers.URLField()))
+    def get_image_variants(self, obj):
+        """Return the URL of every variant rendered so far"""
+        request = self.context.get('request')
+        urls = {}
+        for variant, name in obj.image_variants.items():
+            url = recipe_image_storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) \
+                if request is not None else url
+        return urls
+
+
+class RecipeDetailSerializer(ImageVariantsMixin, RecipeSerializer):
     """Serializer for recipe detail objects"""
+    image_variants = serializers.SerializerMethodField()
+
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_variants'
+        ]
+
 
+class RecipeBulkSelectSerializer(serializers.Serializer):
+    """Serializer picking recipes for a bulk action"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+    )
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+
+class RecipeBulkUpdateSerializer(serializers.ModelSerializer):
+    """Serializer for setting scalar fields on many recipes"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+    )
+
+    class Meta:
+        model = Recipe
+        fields = [
+            'ids', 'title', 'time_minutes', 'price', 'link', 'description'
+        ]
+
+    def validate(self, attrs):
+        """Require at least one field to change"""
+        if not set(attrs) - {'ids'}:
+            raise serializers.ValidationError('No fields to update.')
+        return attrs
+
+
+class RecipeMembershipSerializer(serializers.Serializer):
+    """Serializer naming one tag or ingredient of a recipe"""
+    id = serializers.IntegerField(required=False)
+    name = serializers.CharField(max_length=255, required=False)
+
+    def validate(self, attrs):
+        """Require exactly one of id and name"""
+        if len(attrs) != 1:
+            raise serializers.ValidationError('Provide either id or name.')
+        return attrs
+
+
+class RecipeImageSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     """serializerfor uploading images to recipes"""
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'image_variants']
         read_only_fields = ['id']
         extra_kwargs = {
             'image': {'required': True}
         }
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    """Serializer for chunked image upload sessions"""
+    class Meta:
+        model = ImageUpload
+        fields = ['id', 'size', 'offset']
+        read_only_fields = ['id', 'offset']
+
+    def validate_size(self, value):
+        """Check the declared size is within the upload limit"""
+        if not 0 < value <= settings.IMAGE_UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(
+                f'Must be between 1 and {settings.IMAGE_UPLOAD_MAX_BYTES} '
+                f'bytes.'
+            )
+        return value
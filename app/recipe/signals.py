@@ -0,0 +1,42 @@
+"""
+Signal handlers keeping the recipe API response cache and stored images
+in step with the database.
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Ingredient
+from core.storage import recipe_image_storage
+from recipe.cache import invalidate_user
+
+
+def release_image(name):
+    """Release a recipe's reference to an image once the change commits"""
+    if name:
+        transaction.on_commit(lambda: recipe_image_storage.release(name))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_on_change(sender, instance, **kwargs):
+    """Invalidate the owner's cached responses when an object changes"""
+    invalidate_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_on_relation_change(sender, instance, action, **kwargs):
+    """Invalidate the owner's cached responses when links change"""
+    if action.startswith('post_'):
+        invalidate_user(instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image_on_delete(sender, instance, **kwargs):
+    """Drop the deleted recipe's reference to its image"""
+    release_image(instance.image.name)
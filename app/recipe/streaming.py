@@ -0,0 +1,109 @@
+"""
+Helpers for streaming large recipe responses.
+"""
+import csv
+import io
+
+from django.db.models import prefetch_related_objects
+
+from core.renderers import ORJSONRenderer
+
+
+CHUNK_SIZE = 500
+CSV_LIST_SEPARATOR = '|'
+CSV_LIST_ESCAPE = '\\'
+
+
+def iter_chunks(queryset, prefetches=(), chunk_size=None):
+    """Yield lists of objects read through a server-side cursor
+
+    QuerySet.iterator() ignores prefetch_related, so the given prefetches
+    are applied to each chunk instead.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            prefetch_related_objects(chunk, *prefetches)
+            yield chunk
+            chunk = []
+
+    if chunk:
+        prefetch_related_objects(chunk, *prefetches)
+        yield chunk
+
+
+def stream_json_list(chunks, serialize):
+    """Yield a JSON array one serialized chunk at a time"""
+    renderer = ORJSONRenderer()
+    separator = b''
+    yield b'['
+    for chunk in chunks:
+        data = serialize(chunk)
+        if data:
+            yield separator + b','.join(renderer.render(item) for item in data)
+            separator = b','
+    yield b']'
+
+
+def stream_ndjson(chunks, serialize):
+    """Yield one JSON document per line, a serialized chunk at a time"""
+    renderer = ORJSONRenderer()
+    for chunk in chunks:
+        data = serialize(chunk)
+        if data:
+            yield b''.join(renderer.render(item) + b'\n' for item in data)
+
+
+def join_csv_list(names):
+    """Join names into one CSV cell, escaping the separator in them"""
+    return CSV_LIST_SEPARATOR.join(
+        name.replace(CSV_LIST_ESCAPE, CSV_LIST_ESCAPE * 2)
+        .replace(CSV_LIST_SEPARATOR, CSV_LIST_ESCAPE + CSV_LIST_SEPARATOR)
+        for name in names
+    )
+
+
+def split_csv_list(value):
+    """Split a CSV cell written by join_csv_list back into names"""
+    names, name = [], []
+    chars = iter(value)
+    for char in chars:
+        if char == CSV_LIST_ESCAPE:
+            name.append(next(chars, ''))
+        elif char == CSV_LIST_SEPARATOR:
+            names.append(''.join(name))
+            name = []
+        else:
+            name.append(char)
+    names.append(''.join(name))
+    return names
+
+
+def _csv_value(value):
+    """Flatten a serialized value into a CSV cell"""
+    if isinstance(value, list):
+        return join_csv_list(item['name'] for item in value)
+    return value
+
+
+def stream_csv(chunks, serialize, fields):
+    """Yield CSV text with a header row, a serialized chunk at a time
+
+    Related objects are written as their names joined by '|', with '|'
+    and '\\' in names escaped by a backslash, the layout the
+    import_recipes command reads back.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for chunk in chunks:
+        for item in serialize(chunk):
+            writer.writerow([_csv_value(item[field]) for field in fields])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
@@ -0,0 +1,143 @@
+"""
+Tests for the per-user response cache of the recipe API
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import get_cache, user_generation
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    """Test caching and invalidation of list responses"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def test_cached_list_skips_queryset(self):
+        """Test a repeated list is answered from the cache"""
+        first = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPES_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+
+    def test_params_are_normalized(self):
+        """Test parameter order does not split cache entries"""
+        self.client.get(RECIPES_URL + '?fields=id&page_size=5')
+
+        with self.assertNumQueries(0):
+            self.client.get(RECIPES_URL + '?page_size=5&fields=id')
+
+    def test_different_params_are_cached_separately(self):
+        """Test different query params do not share an entry"""
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(RECIPES_URL, {'fields': 'id'})
+
+        self.assertEqual(res.data['results'], [{'id': self.recipe.id}])
+
+    def test_recipe_save_invalidates(self):
+        """Test saving a recipe invalidates the cached list"""
+        self.client.get(RECIPES_URL)
+
+        self.recipe.title = 'Changed'
+        self.recipe.save()
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'][0]['title'], 'Changed')
+
+    def test_recipe_delete_invalidates(self):
+        """Test deleting a recipe invalidates the cached list"""
+        self.client.get(RECIPES_URL)
+
+        self.recipe.delete()
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_delete_invalidates_again_on_commit(self):
+        """Test lists cached before a delete commits are dropped with it"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+            # a concurrent list could cache the old rows under this token
+            generation = user_generation(self.user.pk)
+
+        self.assertNotEqual(user_generation(self.user.pk), generation)
+
+    def test_tag_link_invalidates(self):
+        """Test linking a tag to a recipe invalidates the cached list"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(RECIPES_URL)
+
+        self.recipe.tags.add(tag)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'], 'Vegan')
+
+    def test_ingredient_unlink_from_ingredient_side_invalidates(self):
+        """Test removing a link through the reverse side invalidates"""
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        self.recipe.ingredients.add(ingredient)
+        self.client.get(RECIPES_URL)
+
+        ingredient.recipe_set.remove(self.recipe)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'][0]['ingredients'], [])
+
+    def test_tag_rename_invalidates_tag_list(self):
+        """Test renaming a tag invalidates the cached tag list"""
+        tag = Tag.objects.create(user=self.user, name='Old')
+        self.client.get(TAGS_URL)
+
+        tag.name = 'New'
+        tag.save()
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data[0]['name'], 'New')
+
+    def test_cache_is_per_user(self):
+        """Test one user's cached list is not served to another"""
+        self.client.get(INGREDIENTS_URL)
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        Ingredient.objects.create(user=other, name='Pepper')
+        self.client.force_authenticate(user=other)
+
+        res = self.client.get(INGREDIENTS_URL)
+
+        self.assertEqual(res.data[0]['name'], 'Pepper')
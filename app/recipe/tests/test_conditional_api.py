@@ -0,0 +1,141 @@
+"""
+Tests for conditional GET support on the recipe API
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag handling"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def test_list_sets_validators(self):
+        """Test listing recipes returns an ETag"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', res)
+
+    def test_matching_etag_returns_not_modified(self):
+        """Test a matching If-None-Match is answered without queries"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_etag_changes_when_recipe_updated(self):
+        """Test updating a recipe invalidates the ETag"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        self.recipe.title = 'Changed'
+        self.recipe.save()
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_etag_changes_when_tag_deleted(self):
+        """Test deleting a tag invalidates the ETag"""
+        tag1 = Tag.objects.create(user=self.user, name='Old')
+        Tag.objects.create(user=self.user, name='New')
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        tag1.delete()
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_query_params(self):
+        """Test different query params produce different ETags"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'fields': 'id'},
+            HTTP_IF_NONE_MATCH=etag,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_not_shared_between_users(self):
+        """Test another user's ETag does not match"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        create_recipe(user=other)
+        self.client.force_authenticate(user=other)
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_not_modified(self):
+        """Test conditional GET on a recipe detail"""
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_etag_changes_when_recipe_deleted(self):
+        """Test deleting another recipe invalidates the detail ETag"""
+        other = create_recipe(user=self.user)
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        other.delete()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_tag_list_not_modified(self):
+        """Test conditional GET on the tag list"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
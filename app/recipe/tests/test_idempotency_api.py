@@ -0,0 +1,182 @@
+"""
+Tests for Idempotency-Key handling in the recipe API
+"""
+import io
+from decimal import Decimal
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.cache import get_cache
+from recipe.idempotency import IN_PROGRESS, _store_key
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+class IdempotencyKeyTests(TestCase):
+    """Test replaying responses for repeated Idempotency-Keys"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.payload = {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': Decimal('2.50'),
+        }
+
+    def post(self, key, payload=None):
+        """Create a recipe with the given Idempotency-Key"""
+        return self.client.post(
+            RECIPES_URL,
+            payload or self.payload,
+            format='json',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_response(self):
+        """Test a retried create returns the first response only once"""
+        first = self.post('key-1')
+
+        with patch(
+            'recipe.serializers.RecipeDetailSerializer.create'
+        ) as patched_create:
+            retry = self.post('key-1')
+
+        patched_create.assert_not_called()
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_different_keys_create_separately(self):
+        """Test each key runs its own request"""
+        self.post('key-1')
+        self.post('key-2')
+
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_no_key_is_not_idempotent(self):
+        """Test requests without a key are never replayed"""
+        self.client.post(RECIPES_URL, self.payload, format='json')
+        res = self.client.post(RECIPES_URL, self.payload, format='json')
+
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_keys_are_per_user(self):
+        """Test another user's request with the same key is not replayed"""
+        self.post('key-1')
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=other)
+
+        res = self.post('key-1')
+
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(Recipe.objects.filter(user=other).count(), 1)
+
+    def test_key_reused_for_other_request(self):
+        """Test reusing a key with a different payload is rejected"""
+        self.post('key-1')
+
+        res = self.post('key-1', {**self.payload, 'title': 'Longer title'})
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_key_reused_for_same_length_request(self):
+        """Test a different payload of the same length is rejected"""
+        self.post('key-1', {**self.payload, 'title': 'Soup A'})
+
+        res = self.post('key-1', {**self.payload, 'title': 'Soup B'})
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)),
+            ['Soup A'],
+        )
+
+    def test_key_in_progress(self):
+        """Test a retry while the first request still runs is refused"""
+        get_cache().set(_store_key(self.user.pk, 'key-1'), IN_PROGRESS)
+
+        res = self.post('key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_invalid_key(self):
+        """Test an empty or overlong key is rejected"""
+        self.assertEqual(self.post('').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post('k' * 256).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_failed_request_releases_key(self):
+        """Test a request that raised can be retried with the same key"""
+        with patch(
+            'recipe.views.RecipeViewSet.perform_create',
+            side_effect=RuntimeError,
+        ):
+            with self.assertRaises(RuntimeError):
+                self.post('key-1')
+
+        res = self.post('key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', res)
+
+    def test_upload_image_replayed(self):
+        """Test a retried image upload does not store a second file"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price='1.00',
+        )
+        self.addCleanup(lambda: Recipe.objects.get().image.delete())
+
+        def upload():
+            image_file = io.BytesIO()
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            image_file.name = 'photo.jpg'
+            return self.client.post(
+                image_upload_url(recipe.id),
+                {'image': image_file},
+                format='multipart',
+                HTTP_IDEMPOTENCY_KEY='upload-1',
+            )
+
+        first = upload()
+        with patch(
+            'recipe.serializers.RecipeImageSerializer.update'
+        ) as patched_update:
+            retry = upload()
+
+        patched_update.assert_not_called()
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data, first.data)
@@ -0,0 +1,211 @@
+"""
+Tests for on-demand resized recipe images
+"""
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.storage import recipe_image_storage
+from recipe import images, resizing
+
+
+def resized_url(recipe_id, size, image_format='jpg'):
+    """Create and return a resized image URL"""
+    width, height = size
+    return reverse(
+        'recipe:recipe-resized-image',
+        args=[recipe_id, width, height, image_format],
+    )
+
+
+class ResizeCacheTestCase(TestCase):
+    """Base test case with temporary media and resize cache directories"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache_dir = os.path.join(self.tmpdir.name, 'resized')
+        paths = override_settings(
+            MEDIA_ROOT=os.path.join(self.tmpdir.name, 'media'),
+            IMAGE_RESIZE_CACHE_DIR=self.cache_dir,
+        )
+        paths.enable()
+        self.addCleanup(paths.disable)
+
+    def store_image(self, size=(800, 400), color='red'):
+        """Store a JPEG and return its storage name"""
+        image_file = io.BytesIO()
+        Image.new('RGB', size, color).save(image_file, format='JPEG')
+        return recipe_image_storage.save(
+            'uploads/recipe/photo.jpg', ContentFile(image_file.getvalue()),
+        )
+
+
+class ResizedImageApiTests(ResizeCacheTestCase):
+    """Test the resized image endpoint"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('1.00'),
+            image=self.store_image(),
+        )
+
+    def test_resize_renders_once(self):
+        """Test the first request renders and later ones hit the cache"""
+        url = resized_url(self.recipe.id, (240, 240))
+
+        res = self.client.get(url, HTTP_ACCEPT='image/jpeg')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        with Image.open(io.BytesIO(b''.join(res.streaming_content))) as img:
+            self.assertEqual(img.size, (240, 120))
+
+        with patch('recipe.resizing.render_resized') as patched_render:
+            res = self.client.get(url)
+            b''.join(res.streaming_content)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        patched_render.assert_not_called()
+
+    @unittest.skipUnless('webp' in images.RESIZE_FORMATS, 'no WebP support')
+    def test_resize_to_webp(self):
+        """Test images can be served as WebP"""
+        res = self.client.get(resized_url(self.recipe.id, (120, 120), 'webp'))
+
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        with Image.open(io.BytesIO(b''.join(res.streaming_content))) as img:
+            self.assertEqual(img.format, 'WEBP')
+
+    def test_resize_not_modified(self):
+        """Test a matching If-None-Match gets a 304"""
+        url = resized_url(self.recipe.id, (120, 120), 'png')
+        res = self.client.get(url)
+        b''.join(res.streaming_content)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_size_not_allowed(self):
+        """Test sizes outside the allowlist are rejected"""
+        res = self.client.get(resized_url(self.recipe.id, (121, 121)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_recipe_without_image(self):
+        """Test resizing a recipe without an image returns 404"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Bare', time_minutes=1, price='1.00',
+        )
+
+        res = self.client.get(resized_url(recipe.id, (120, 120)))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_other_users_recipe(self):
+        """Test another user's recipe image cannot be resized"""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=other)
+
+        res = self.client.get(resized_url(self.recipe.id, (120, 120)))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ResizeCacheTests(ResizeCacheTestCase):
+    """Test the resized image disk cache"""
+
+    def _write_entry(self, name, size, mtime):
+        """Write a cache file with the given size and modification time"""
+        path = os.path.join(self.cache_dir, 'ab', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as entry:
+            entry.write(b'\0' * size)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_evict_least_recently_used(self):
+        """Test eviction removes the oldest files until under budget"""
+        oldest = self._write_entry('a-1x1.jpg', 100, 1000)
+        middle = self._write_entry('b-1x1.jpg', 100, 2000)
+        newest = self._write_entry('c-1x1.jpg', 100, 3000)
+
+        resizing.evict(budget=150)
+
+        self.assertFalse(os.path.exists(oldest))
+        self.assertFalse(os.path.exists(middle))
+        self.assertTrue(os.path.exists(newest))
+
+    def test_hit_marks_entry_recently_used(self):
+        """Test serving a cached file protects it from eviction"""
+        name = self.store_image()
+        source = recipe_image_storage.path(name)
+        first = resizing.cache_path(name, 120, 120, 'jpg')
+        resizing.get_resized(source, name, 120, 120, 'jpg').close()
+        os.utime(first, (1000, 1000))
+        resizing.get_resized(source, name, 240, 240, 'jpg').close()
+        second = resizing.cache_path(name, 240, 240, 'jpg')
+        os.utime(second, (2000, 2000))
+
+        resizing.get_resized(source, name, 120, 120, 'jpg').close()
+        resizing.evict(budget=os.path.getsize(first))
+
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+
+    def test_concurrent_misses_render_once(self):
+        """Test a burst of requests for one size decodes the source once"""
+        name = self.store_image()
+        source = recipe_image_storage.path(name)
+        calls = []
+
+        def slow_render(*args):
+            calls.append(args)
+            time.sleep(0.2)
+            images.render_resized(*args)
+
+        def fetch():
+            resizing.get_resized(source, name, 480, 480, 'jpg').close()
+
+        with patch('recipe.resizing.render_resized', side_effect=slow_render):
+            threads = [threading.Thread(target=fetch) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(
+            os.path.exists(resizing.cache_path(name, 480, 480, 'jpg'))
+        )
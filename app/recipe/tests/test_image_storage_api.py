@@ -0,0 +1,135 @@
+"""
+Tests for sharing stored images between recipes
+"""
+import io
+import tempfile
+from decimal import Decimal
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageBlob, Recipe
+from core.storage import recipe_image_storage
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def jpeg_bytes(color):
+    """Return the bytes of a small JPEG"""
+    image_file = io.BytesIO()
+    Image.new('RGB', (20, 20), color).save(image_file, format='JPEG')
+    return image_file.getvalue()
+
+
+@override_settings(IMAGE_VARIANT_WORKERS=0)
+class SharedImageTests(TestCase):
+    """Test deduplicated recipe images through the API"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipes = [
+            Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price=Decimal('1.00'),
+            )
+            for i in range(2)
+        ]
+
+    def _upload(self, recipe, content):
+        """Upload image bytes to a recipe and return the stored name"""
+        image_file = io.BytesIO(content)
+        image_file.name = 'stock.jpg'
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                image_upload_url(recipe.id),
+                {'image': image_file},
+                format='multipart',
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        return recipe.image.name
+
+    def _delete(self, recipe):
+        """Delete a recipe through the API"""
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.delete(detail_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_same_photo_stored_once(self):
+        """Test the same upload on two recipes shares one file"""
+        content = jpeg_bytes('red')
+        first = self._upload(self.recipes[0], content)
+        second = self._upload(self.recipes[1], content)
+
+        self.assertEqual(first, second)
+        self.assertEqual(ImageBlob.objects.get(name=first).refcount, 2)
+        self.assertEqual(self.recipes[0].image_variants,
+                         self.recipes[1].image_variants)
+
+    def test_file_kept_until_last_recipe_deleted(self):
+        """Test deleting one of two recipes keeps the shared file"""
+        content = jpeg_bytes('red')
+        name = self._upload(self.recipes[0], content)
+        self._upload(self.recipes[1], content)
+        thumb = self.recipes[0].image_variants['thumb']
+
+        self._delete(self.recipes[0])
+
+        self.assertTrue(recipe_image_storage.exists(name))
+        self.assertTrue(recipe_image_storage.exists(thumb))
+
+        self._delete(self.recipes[1])
+
+        self.assertFalse(recipe_image_storage.exists(name))
+        self.assertFalse(recipe_image_storage.exists(thumb))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_replacing_image_releases_previous(self):
+        """Test uploading a new image drops the old file's reference"""
+        old = self._upload(self.recipes[0], jpeg_bytes('red'))
+
+        new = self._upload(self.recipes[0], jpeg_bytes('blue'))
+
+        self.assertNotEqual(old, new)
+        self.assertFalse(recipe_image_storage.exists(old))
+        self.assertEqual(
+            list(ImageBlob.objects.values_list('name', 'refcount')),
+            [(new, 1)],
+        )
+
+    def test_reuploading_same_image_keeps_file(self):
+        """Test uploading the current image again keeps one reference"""
+        content = jpeg_bytes('red')
+        name = self._upload(self.recipes[0], content)
+
+        self.assertEqual(self._upload(self.recipes[0], content), name)
+
+        self.assertTrue(recipe_image_storage.exists(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
@@ -0,0 +1,291 @@
+"""
+Tests for resumable chunked recipe image uploads
+"""
+import io
+import os
+import struct
+import tempfile
+import zlib
+from decimal import Decimal
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageUpload, Recipe
+
+
+CHUNK_TYPE = 'application/offset+octet-stream'
+
+
+def uploads_url(recipe_id):
+    """Create and return the URL opening a chunked upload"""
+    return reverse('recipe:recipe-start-image-upload', args=[recipe_id])
+
+
+def upload_url(recipe_id, upload_id):
+    """Create and return the URL of a chunked upload"""
+    return reverse(
+        'recipe:recipe-image-upload', args=[recipe_id, upload_id],
+    )
+
+
+def png_bytes(size=(64, 64)):
+    """Return the bytes of a noisy PNG"""
+    image_file = io.BytesIO()
+    Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3)).save(
+        image_file, format='PNG',
+    )
+    return image_file.getvalue()
+
+
+def jpeg_with_exif(exif_bytes):
+    """Return the bytes of a JPEG whose frame header follows a large EXIF"""
+    image_file = io.BytesIO()
+    Image.frombytes('RGB', (32, 32), os.urandom(32 * 32 * 3)).save(
+        image_file, format='JPEG',
+        exif=b'Exif\0\0' + os.urandom(exif_bytes),
+    )
+    return image_file.getvalue()
+
+
+def png_chunk(chunk_type, data):
+    """Return a PNG chunk with its length and checksum"""
+    body = chunk_type + data
+    return struct.pack('>I', len(data)) + body + \
+        struct.pack('>I', zlib.crc32(body))
+
+
+def png_header(width, height):
+    """Return the start of a PNG declaring the dimensions"""
+    return b'\x89PNG\r\n\x1a\n' + png_chunk(
+        b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0),
+    ) + png_chunk(b'IDAT', b'')
+
+
+@override_settings(IMAGE_VARIANT_WORKERS=0)
+class ChunkedImageUploadTests(TestCase):
+    """Test the chunked image upload protocol"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        paths = override_settings(
+            MEDIA_ROOT=os.path.join(self.tmpdir.name, 'media'),
+            IMAGE_UPLOAD_TEMP_DIR=os.path.join(self.tmpdir.name, 'partial'),
+        )
+        paths.enable()
+        self.addCleanup(paths.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+
+    def _start(self, size):
+        """Open an upload and return its id"""
+        res = self.client.post(uploads_url(self.recipe.id), {'size': size})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def _send(self, upload_id, offset, chunk, content_type=CHUNK_TYPE):
+        """Send one chunk of an upload"""
+        return self.client.generic(
+            'PATCH',
+            upload_url(self.recipe.id, upload_id),
+            data=chunk,
+            content_type=content_type,
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def _partial_files(self):
+        """Return the partial files left on disk"""
+        directory = os.path.join(self.tmpdir.name, 'partial')
+        return os.listdir(directory) if os.path.exists(directory) else []
+
+    def test_upload_in_chunks(self):
+        """Test an image sent in chunks becomes the recipe image"""
+        content = png_bytes()
+        upload_id = self._start(len(content))
+        middle = len(content) // 2
+
+        res = self._send(upload_id, 0, content[:middle])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['offset'], middle)
+        self.assertEqual(res['Upload-Offset'], str(middle))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self._send(upload_id, middle, content[middle:])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image.name.endswith('.png'))
+        with self.recipe.image.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+        self.assertIn('thumb', self.recipe.image_variants)
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertEqual(self._partial_files(), [])
+
+    def test_resume_from_reported_offset(self):
+        """Test a client can ask for the offset and continue from it"""
+        content = png_bytes()
+        upload_id = self._start(len(content))
+        self._send(upload_id, 0, content[:100])
+
+        state = self.client.get(upload_url(self.recipe.id, upload_id))
+        stale = self._send(upload_id, 0, content[:100])
+
+        self.assertEqual(state.data['offset'], 100)
+        self.assertEqual(stale.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(stale['Upload-Offset'], '100')
+        res = self._send(upload_id, 100, content[100:])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('image', res.data)
+
+    def test_non_image_rejected_on_first_chunk(self):
+        """Test a first chunk without image magic bytes ends the upload"""
+        upload_id = self._start(1000)
+
+        res = self._send(upload_id, 0, b'%PDF-1.4' + b'\0' * 100)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertEqual(self._partial_files(), [])
+
+    def test_header_spanning_chunks_kept(self):
+        """Test a header not yet complete in the first chunk is waited for"""
+        content = jpeg_with_exif(20000)
+        upload_id = self._start(len(content))
+
+        res = self._send(upload_id, 0, content[:4096])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(ImageUpload.objects.get().image_format, '')
+        res = self._send(upload_id, 4096, content[4096:])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image.name.endswith('.jpg'))
+
+    @override_settings(IMAGE_UPLOAD_HEADER_BYTES=4096)
+    def test_header_past_limit_rejected(self):
+        """Test a header not found within the header limit ends the upload"""
+        content = jpeg_with_exif(20000)
+        upload_id = self._start(len(content))
+
+        res = self._send(upload_id, 0, content[:2048])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self._send(upload_id, 2048, content[2048:8192])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertEqual(self._partial_files(), [])
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000)
+    def test_oversized_dimensions_rejected_on_first_chunk(self):
+        """Test declared dimensions over the limit end the upload"""
+        content = png_bytes((40, 40))
+        upload_id = self._start(len(content))
+
+        res = self._send(upload_id, 0, content[:64])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('40x40', res.data['detail'])
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_decompression_bomb_rejected(self):
+        """Test a header declaring a huge image is rejected unread"""
+        upload_id = self._start(10 * 1024 * 1024)
+
+        res = self._send(upload_id, 0, png_header(100000, 100000))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['detail'], 'Image is too large.')
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_corrupt_image_rejected_when_complete(self):
+        """Test an image failing verification is not stored"""
+        content = png_bytes()
+        corrupt = content[:-40] + b'\0' * 40
+        upload_id = self._start(len(corrupt))
+
+        res = self._send(upload_id, 0, corrupt)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+        self.assertEqual(self._partial_files(), [])
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=100)
+    def test_declared_size_limit(self):
+        """Test an upload larger than the limit cannot be opened"""
+        res = self.client.post(uploads_url(self.recipe.id), {'size': 101})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(IMAGE_UPLOAD_MAX_CHUNK_BYTES=10)
+    def test_chunk_size_limit(self):
+        """Test a chunk larger than the limit is refused unread"""
+        upload_id = self._start(1000)
+
+        res = self._send(upload_id, 0, b'\x89PNG' + b'\0' * 20)
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(ImageUpload.objects.get().offset, 0)
+
+    def test_chunk_past_declared_size(self):
+        """Test a chunk running past the declared size is refused"""
+        content = png_bytes()
+        upload_id = self._start(len(content) - 1)
+
+        res = self._send(upload_id, 0, content)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_chunk_content_type_required(self):
+        """Test chunks must be sent as raw bytes"""
+        upload_id = self._start(100)
+
+        res = self._send(upload_id, 0, b'{}', content_type='application/json')
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_cancel_upload(self):
+        """Test abandoning an upload removes its partial file"""
+        content = png_bytes()
+        upload_id = self._start(len(content))
+        self._send(upload_id, 0, content[:100])
+
+        res = self.client.delete(upload_url(self.recipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertEqual(self._partial_files(), [])
+
+    def test_other_users_upload_not_found(self):
+        """Test uploads of another user's recipe cannot be used"""
+        upload_id = self._start(100)
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=other)
+
+        res = self.client.get(upload_url(self.recipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
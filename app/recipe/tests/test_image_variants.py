@@ -0,0 +1,229 @@
+"""
+Tests for resized recipe image variants
+"""
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe import pipeline
+from recipe.images import render_variants
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class RenderVariantsTests(TestCase):
+    """Test rendering variants of an image file"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _source(self, size, mode='RGB', orientation=None, fmt='JPEG',
+                color='red'):
+        """Write a source image and return its path"""
+        path = os.path.join(self.tmpdir.name, f'photo.{fmt.lower()}')
+        image = Image.new(mode, size, color)
+        params = {}
+        if orientation is not None:
+            exif = Image.Exif()
+            exif[0x0112] = orientation
+            params['exif'] = exif.tobytes()
+        image.save(path, format=fmt, **params)
+        return path
+
+    def _open(self, name):
+        """Open a rendered variant by its storage name"""
+        return Image.open(
+            os.path.join(self.tmpdir.name, os.path.basename(name))
+        )
+
+    def test_variants_fit_their_sizes(self):
+        """Test each variant is scaled down to its longest edge"""
+        path = self._source((2000, 1000))
+
+        variants = render_variants(path, 'uploads/recipe/photo.jpeg')
+
+        self.assertEqual(variants, {
+            'thumb': 'uploads/recipe/photo.thumb.jpg',
+            'medium': 'uploads/recipe/photo.medium.jpg',
+            'large': 'uploads/recipe/photo.large.jpg',
+        })
+        with self._open(variants['thumb']) as thumb:
+            self.assertEqual(thumb.size, (120, 60))
+            self.assertEqual(thumb.format, 'JPEG')
+        with self._open(variants['large']) as large:
+            self.assertEqual(large.size, (1200, 600))
+
+    def test_small_images_not_upscaled(self):
+        """Test variants larger than the source keep its size"""
+        path = self._source((300, 200))
+
+        variants = render_variants(path, 'photo.jpeg')
+
+        with self._open(variants['large']) as large:
+            self.assertEqual(large.size, (300, 200))
+
+    def test_orientation_applied_and_metadata_stripped(self):
+        """Test EXIF rotation is baked in and no EXIF is kept"""
+        path = self._source((400, 200), orientation=6)
+
+        variants = render_variants(path, 'photo.jpeg')
+
+        with self._open(variants['medium']) as medium:
+            self.assertEqual(medium.size, (200, 400))
+            self.assertNotIn('exif', medium.info)
+
+    def test_transparency_flattened(self):
+        """Test transparent images are rendered onto white"""
+        path = self._source(
+            (50, 50), mode='RGBA', fmt='PNG', color=(0, 0, 0, 0),
+        )
+
+        variants = render_variants(path, 'photo.png')
+
+        with self._open(variants['thumb']) as thumb:
+            self.assertEqual(thumb.mode, 'RGB')
+            red, green, blue = thumb.getpixel((0, 0))
+            self.assertGreater(min(red, green, blue), 200)
+
+
+@override_settings(IMAGE_VARIANT_WORKERS=0)
+class ImageVariantsApiTests(TestCase):
+    """Test variants produced by the image upload endpoint"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+
+    def _upload(self):
+        """Upload a JPEG to the recipe"""
+        image_file = io.BytesIO()
+        Image.new('RGB', (800, 600)).save(image_file, format='JPEG')
+        image_file.seek(0)
+        image_file.name = 'photo.jpg'
+        return self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': image_file},
+            format='multipart',
+        )
+
+    def test_upload_renders_variants_after_commit(self):
+        """Test the variants are recorded once the upload commits"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            res = self._upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_variants'], {})
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+
+        for callback in callbacks:
+            callback()
+        self.recipe.refresh_from_db()
+        self.assertEqual(set(self.recipe.image_variants),
+                         {'thumb', 'medium', 'large'})
+        for name in self.recipe.image_variants.values():
+            self.assertTrue(
+                os.path.exists(os.path.join(self.tmpdir.name, name))
+            )
+
+        detail = self.client.get(detail_url(self.recipe.id))
+        thumb = detail.data['image_variants']['thumb']
+        self.assertTrue(thumb.startswith('http://testserver/'))
+        self.assertTrue(thumb.endswith('.thumb.jpg'))
+
+    def test_new_upload_clears_old_variants(self):
+        """Test a replaced image does not keep the previous variants"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload()
+
+        with self.captureOnCommitCallbacks(execute=False):
+            res = self._upload()
+
+        self.assertEqual(res.data['image_variants'], {})
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+
+    @override_settings(IMAGE_VARIANT_WORKERS=2)
+    @patch('recipe.pipeline.get_executor')
+    def test_upload_submits_to_pool(self, patched_executor):
+        """Test rendering is handed to the process pool"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload()
+
+        self.recipe.refresh_from_db()
+        submit = patched_executor.return_value.submit
+        submit.assert_called_once_with(
+            render_variants, self.recipe.image.path, self.recipe.image.name,
+        )
+        self.assertEqual(self.recipe.image_variants, {})
+
+    @patch('recipe.pipeline.connection')
+    def test_pool_result_stored(self, patched_connection):
+        """Test a finished render records the variants on the recipe"""
+        self.recipe.image = 'uploads/recipe/photo.jpg'
+        self.recipe.save()
+        future = patch('concurrent.futures.Future').start()
+        self.addCleanup(patch.stopall)
+        future.result.return_value = {'thumb': 'uploads/recipe/t.jpg'}
+
+        pipeline._variants_done(
+            self.recipe.id, self.user.id, 'uploads/recipe/photo.jpg', future,
+        )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants,
+                         {'thumb': 'uploads/recipe/t.jpg'})
+        patched_connection.close.assert_called_once()
+
+    @patch('recipe.pipeline.connection')
+    def test_pool_result_for_replaced_image_ignored(self, patched_connection):
+        """Test variants of an image replaced meanwhile are not recorded"""
+        self.recipe.image = 'uploads/recipe/new.jpg'
+        self.recipe.save()
+        future = patch('concurrent.futures.Future').start()
+        self.addCleanup(patch.stopall)
+        future.result.return_value = {'thumb': 'uploads/recipe/t.jpg'}
+
+        pipeline._variants_done(
+            self.recipe.id, self.user.id, 'uploads/recipe/old.jpg', future,
+        )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
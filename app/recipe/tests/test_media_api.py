@@ -0,0 +1,191 @@
+"""
+Tests for serving recipe media files.
+"""
+import os
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.storage import recipe_image_storage
+from recipe.images import variant_name
+
+
+CONTENT = bytes(range(256)) * 4
+
+
+def media_url(name):
+    """Create and return a media URL"""
+    return reverse('media', args=[name])
+
+
+class MediaApiTests(TestCase):
+    """Test serving recipe images to their owner"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        media = override_settings(
+            MEDIA_ROOT=self.tmpdir.name,
+            MEDIA_SENDFILE_HEADER='',
+        )
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.name = recipe_image_storage.save(
+            'uploads/recipe/photo.jpg', ContentFile(CONTENT),
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('1.00'),
+            image=self.name,
+        )
+
+    def get(self, name, **headers):
+        """Request a media file and return the response and its body"""
+        res = self.client.get(media_url(name), **headers)
+        body = b''.join(res.streaming_content) if res.streaming else \
+            res.content
+        return res, body
+
+    def test_serve_content_addressed_image(self):
+        """Test a hashed image is served with immutable caching"""
+        res, body = self.get(self.name, HTTP_ACCEPT='image/*')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(body, CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertEqual(res['ETag'], f'"{os.path.basename(self.name)}"')
+        self.assertIn('immutable', res['Cache-Control'])
+
+    def test_serve_variant(self):
+        """Test rendered variants of the image are served"""
+        variant = variant_name(self.name, 'thumb')
+        with open(recipe_image_storage.path(variant), 'wb') as thumb:
+            thumb.write(b'thumb')
+        self.recipe.image_variants = {'thumb': variant}
+        self.recipe.save()
+
+        res, body = self.get(variant)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(body, b'thumb')
+
+    def test_not_modified(self):
+        """Test a matching If-None-Match gets a 304"""
+        res, _ = self.get(self.name)
+
+        res, _ = self.get(self.name, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_range_request(self):
+        """Test a byte range is served as partial content"""
+        res, body = self.get(self.name, HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(body, CONTENT[10:20])
+        self.assertEqual(res['Content-Length'], '10')
+        self.assertEqual(
+            res['Content-Range'], f'bytes 10-19/{len(CONTENT)}',
+        )
+
+    def test_range_not_satisfiable(self):
+        """Test a range past the end of the file gets a 416"""
+        res, _ = self.get(self.name, HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        )
+        self.assertEqual(res['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_stale_if_range_sends_whole_file(self):
+        """Test a range for an older version gets the whole file"""
+        res, body = self.get(
+            self.name, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(body, CONTENT)
+
+    def test_legacy_name_revalidated(self):
+        """Test files not named by hash are revalidated on every use"""
+        name = 'uploads/recipe/legacy.jpg'
+        with open(recipe_image_storage.path(name), 'wb') as legacy:
+            legacy.write(b'legacy')
+        self.recipe.image = name
+        self.recipe.save()
+
+        res, body = self.get(name)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(body, b'legacy')
+        self.assertEqual(res['Cache-Control'], 'private, no-cache')
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect')
+    def test_accel_redirect(self):
+        """Test nginx is asked to send the file"""
+        res, body = self.get(self.name, HTTP_RANGE='bytes=0-9')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(body, b'')
+        self.assertEqual(
+            res['X-Accel-Redirect'], f'/protected-media/{self.name}',
+        )
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Sendfile')
+    def test_x_sendfile(self):
+        """Test the web server is given the file path"""
+        res, _ = self.get(self.name)
+
+        self.assertEqual(
+            res['X-Sendfile'], recipe_image_storage.path(self.name),
+        )
+
+    def test_other_users_image(self):
+        """Test another user's image is not served"""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=other)
+
+        res, _ = self.get(self.name)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unreferenced_file(self):
+        """Test files no recipe points at are not served"""
+        name = recipe_image_storage.save(
+            'uploads/recipe/other.jpg', ContentFile(b'other'),
+        )
+
+        res, _ = self.get(name)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_auth_required(self):
+        """Test anonymous requests are rejected"""
+        self.client.force_authenticate(user=None)
+
+        res, _ = self.get(self.name)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,178 @@
+"""
+Tests for the query plans of the hot recipe API queries
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+USERS = 20
+RECIPES_PER_USER = 200
+ATTRS_PER_USER = 40
+
+# Single-column foreign key indexes covered by the indexes under test
+SHADOWED_INDEX_COLUMNS = {
+    'core_recipe': ['user_id'],
+    'core_tag': ['user_id'],
+    'core_ingredient': ['user_id'],
+    'core_recipe_tags': ['tag_id'],
+    'core_recipe_ingredients': ['ingredient_id'],
+}
+
+
+class QueryPlanTests(TestCase):
+    """Test hot queries use indexes rather than sequential scans"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user_model = get_user_model()
+        users = user_model.objects.bulk_create(
+            user_model(email=f'user{i}@example.com') for i in range(USERS)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=10,
+                price=Decimal('5.00'),
+            )
+            for user in users
+            for i in range(RECIPES_PER_USER)
+        )
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f'Tag {i}')
+            for user in users
+            for i in range(ATTRS_PER_USER)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'Ingredient {i}')
+            for user in users
+            for i in range(ATTRS_PER_USER)
+        )
+
+        tag_links = []
+        ingredient_links = []
+        for user in users:
+            recipe_ids = Recipe.objects.filter(
+                user=user
+            ).values_list('id', flat=True)
+            tag_ids = list(
+                Tag.objects.filter(user=user).values_list('id', flat=True)
+            )
+            ingredient_ids = list(
+                Ingredient.objects.filter(
+                    user=user
+                ).values_list('id', flat=True)
+            )
+            for i, recipe_id in enumerate(recipe_ids):
+                for offset in range(3):
+                    tag_links.append(Recipe.tags.through(
+                        recipe_id=recipe_id,
+                        tag_id=tag_ids[(i + offset) % len(tag_ids)],
+                    ))
+                    ingredient_links.append(Recipe.ingredients.through(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_ids[
+                            (i + offset) % len(ingredient_ids)
+                        ],
+                    ))
+        Recipe.tags.through.objects.bulk_create(tag_links)
+        Recipe.ingredients.through.objects.bulk_create(ingredient_links)
+
+        cls.user = users[0]
+        cls.tag = Tag.objects.filter(user=cls.user).first()
+        cls.ingredient = Ingredient.objects.filter(user=cls.user).first()
+
+        with connection.cursor() as cursor:
+            for table in (
+                'core_user',
+                'core_recipe',
+                'core_tag',
+                'core_ingredient',
+                'core_recipe_tags',
+                'core_recipe_ingredients',
+            ):
+                cursor.execute(f'ANALYZE {table}')
+
+            # Dropped for this test case only, so that only the indexes
+            # under test can keep the planner away from sequential scans
+            for table, columns in SHADOWED_INDEX_COLUMNS.items():
+                constraints = connection.introspection.get_constraints(
+                    cursor, table,
+                )
+                for name, info in constraints.items():
+                    if info['index'] and not info['unique'] and \
+                            info['columns'] == columns:
+                        cursor.execute(
+                            f'DROP INDEX {connection.ops.quote_name(name)}'
+                        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def assertUsesIndexes(self, url, indexes, params=None):
+        """Run a request and assert its queries use the given indexes
+
+        Sequential scans are disabled for the EXPLAIN, so the planner only
+        falls back to one when no index can serve the query. Each index
+        must also appear in one of the plans.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params)
+
+        self.assertTrue(queries.captured_queries)
+        plans = []
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for query in queries.captured_queries:
+                cursor.execute(f'EXPLAIN {query["sql"]}')
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                self.assertNotIn('Seq Scan', plan, msg=query['sql'])
+                plans.append(plan)
+
+        for index in indexes:
+            self.assertIn(index, '\n'.join(plans))
+
+    def test_recipe_list_uses_indexes(self):
+        """Test listing recipes uses the (user, id) index"""
+        self.assertUsesIndexes(RECIPES_URL, ['recipe_user_id_idx'])
+
+    def test_recipe_tag_filter_uses_indexes(self):
+        """Test filtering recipes by tag uses its link index"""
+        self.assertUsesIndexes(
+            RECIPES_URL,
+            ['recipe_user_id_idx', 'recipe_tags_tag_recipe_idx'],
+            {'tags': self.tag.id},
+        )
+
+    def test_recipe_ingredient_filter_uses_indexes(self):
+        """Test filtering recipes by ingredient uses its link index"""
+        self.assertUsesIndexes(
+            RECIPES_URL,
+            ['recipe_user_id_idx', 'recipe_ingredients_ingredient_recipe_idx'],
+            {'ingredients': self.ingredient.id},
+        )
+
+    def test_tag_list_uses_indexes(self):
+        """Test listing tags uses the (user, name) unique index"""
+        self.assertUsesIndexes(TAGS_URL, ['unique_tag_name_per_user'])
+
+    def test_ingredient_list_uses_indexes(self):
+        """Test listing ingredients uses the (user, name) unique index"""
+        self.assertUsesIndexes(
+            INGREDIENTS_URL,
+            ['unique_ingredient_name_per_user'],
+        )
@@ -2,13 +2,20 @@
 Test for the recipe API
 """
 from decimal import Decimal
+from unittest.mock import patch
+import csv
+import gzip
+import io
+import json
 import tempfile
 import os
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -16,13 +23,18 @@ from rest_framework.test import APIClient
 
 from core.models import Recipe, Tag, Ingredient
 
+from recipe.pagination import RecipeCursorPagination
 from recipe.serializers import (
     RecipeSerializer,
-    RecipeDetailSerializer
+    RecipeDetailSerializer,
+    TagSerializer,
 )
+from recipe.streaming import split_csv_list
+from recipe.views import RecipeViewSet
 
 
 RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
 
 
 def detail_url(recipe_id):
@@ -35,6 +47,16 @@ def image_upload_url(recipe_id):
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
 
+def tags_url(recipe_id):
+    """Create and return a recipe tags membership URL"""
+    return reverse('recipe:recipe-add-tag', args=[recipe_id])
+
+
+def ingredients_url(recipe_id):
+    """Create and return a recipe ingredients membership URL"""
+    return reverse('recipe:recipe-add-ingredient', args=[recipe_id])
+
+
 def create_recipe(user, **params):
     """Create and return a sample recipe"""
     defaults = {
@@ -87,7 +109,7 @@ class PrivateRecipeApiTests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retrieve_recipes_limited_to_user(self):
         """Test retrieving recipes for authenticated user"""
@@ -103,7 +125,7 @@ class PrivateRecipeApiTests(TestCase):
         recipes = Recipe.objects.filter(user=self.user)
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_get_recipe_detail(self):
         """Test getting recipe detail"""
@@ -308,6 +330,54 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.tags.count(), 0)
 
+    def test_update_same_tags_skips_relation_writes(self):
+        """Test resubmitting the stored tags writes nothing to the links"""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Breakfast'),
+            Tag.objects.create(user=self.user, name='Quick'),
+        )
+
+        payload = {
+            'title': 'New title',
+            'tags': [{'name': 'Quick'}, {'name': 'Breakfast'}],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(
+                detail_url(recipe.id),
+                payload,
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        writes = [
+            query['sql'] for query in queries
+            if 'core_recipe_tags' in query['sql']
+            and not query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(writes, [])
+        self.assertEqual(recipe.tags.count(), 2)
+
+    def test_update_tags_writes_only_difference(self):
+        """Test changing one tag keeps the unchanged link row"""
+        recipe = create_recipe(user=self.user)
+        keep = Tag.objects.create(user=self.user, name='Keep')
+        drop = Tag.objects.create(user=self.user, name='Drop')
+        recipe.tags.add(keep, drop)
+        through = Recipe.tags.through
+        kept_link = through.objects.get(recipe=recipe, tag=keep)
+
+        payload = {'tags': [{'name': 'Keep'}, {'name': 'Add'}]}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)),
+            {'Keep', 'Add'},
+        )
+        self.assertTrue(through.objects.filter(id=kept_link.id).exists())
+        self.assertTrue(Tag.objects.filter(id=drop.id).exists())
+
     def test_create_recipe_with_new_ingredients(self):
         """Test creating a recipe with new ingredients"""
         payload = {
@@ -417,9 +487,9 @@ class PrivateRecipeApiTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_by_ingredients(self):
         """Test filtering recipes by ingredients"""
@@ -443,9 +513,677 @@ class PrivateRecipeApiTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+    def test_filter_by_multiple_tags_returns_recipe_once(self):
+        """Test a recipe matching several tags is listed once"""
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Tag1')
+        tag2 = Tag.objects.create(user=self.user, name='Tag2')
+        recipe.tags.add(tag1, tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id}'}
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertNotIn('DISTINCT', queries.captured_queries[0]['sql'])
+
+    def test_filter_match_all_tags(self):
+        """Test match=all returns recipes having every listed tag"""
+        tag1 = Tag.objects.create(user=self.user, name='Tag1')
+        tag2 = Tag.objects.create(user=self.user, name='Tag2')
+        recipe1 = create_recipe(user=self.user, title='Both tags')
+        recipe1.tags.add(tag1, tag2)
+        recipe2 = create_recipe(user=self.user, title='One tag')
+        recipe2.tags.add(tag1)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        res = self.client.get(RECIPES_URL, params)
+
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(ids, [recipe1.id])
+
+    def test_filter_match_all_ingredients(self):
+        """Test match=all returns recipes having every listed ingredient"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        egg = Ingredient.objects.create(user=self.user, name='Egg')
+        recipe1 = create_recipe(user=self.user, title='Both')
+        recipe1.ingredients.add(salt, egg)
+        recipe2 = create_recipe(user=self.user, title='Egg only')
+        recipe2.ingredients.add(egg)
+
+        params = {
+            'ingredients': f'{salt.id},{egg.id},{egg.id}',
+            'match': 'all',
+        }
+        res = self.client.get(RECIPES_URL, params)
+
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(ids, [recipe1.id])
+
+    def test_filter_invalid_match_returns_error(self):
+        """Test an unknown match mode is rejected"""
+        res = self.client.get(RECIPES_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipePaginationTests(TestCase):
+    """Test cursor pagination of the recipe list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_pages_walk_all_recipes_newest_first(self):
+        """Test following next cursors returns every recipe once"""
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['previous'])
+        ids = [item['id'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertIsNotNone(res.data['previous'])
+            ids.extend(item['id'] for item in res.data['results'])
+
+        expected = [recipe.id for recipe in reversed(recipes)]
+        self.assertEqual(ids, expected)
+
+    def test_page_size_is_capped(self):
+        """Test the requested page size cannot exceed the maximum"""
+        paginator = RecipeCursorPagination
+        with patch.object(paginator, 'max_page_size', 2):
+            for i in range(3):
+                create_recipe(user=self.user, title=f'Recipe {i}')
+
+            res = self.client.get(RECIPES_URL, {'page_size': 1000})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_invalid_cursor_returns_error(self):
+        """Test a tampered cursor is rejected"""
+        res = self.client.get(RECIPES_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipeStreamingTests(TestCase):
+    """Test streaming the recipe list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _stream(self, params=None):
+        """Request the streamed list and return the decoded body"""
+        res = self.client.get(RECIPES_URL, {'stream': 1, **(params or {})})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return json.loads(b''.join(res.streaming_content))
+
+    @patch('recipe.streaming.CHUNK_SIZE', 2)
+    def test_stream_returns_all_recipes(self):
+        """Test streaming returns every recipe across chunks"""
+        for i in range(5):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {i}')
+            )
+        create_recipe(
+            user=create_user(email='other@example.com', password='pass123')
+        )
+
+        data = self._stream()
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        serializer = RecipeSerializer(recipes, many=True)
+        self.assertEqual(data, json.loads(json.dumps(serializer.data)))
+
+    def test_stream_empty_list(self):
+        """Test streaming with no recipes returns an empty array"""
+        self.assertEqual(self._stream(), [])
+
+    def test_stream_applies_filters(self):
+        """Test streaming honours the tag filter"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+        create_recipe(user=self.user)
+
+        data = self._stream({'tags': tag.id})
+
+        self.assertEqual([item['id'] for item in data], [recipe.id])
+
+    def test_stream_invalid_value(self):
+        """Test a stream value other than 0 or 1 is rejected"""
+        for value in ('true', '2', ''):
+            res = self.client.get(RECIPES_URL, {'stream': value})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('stream', res.data)
+
+
+class RecipeExportTests(TestCase):
+    """Test exporting a user's recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _export(self, params=None, **headers):
+        """Request an export and return the response and raw body"""
+        res = self.client.get(EXPORT_URL, params or {}, **headers)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return res, b''.join(res.streaming_content)
+
+    @patch('recipe.streaming.CHUNK_SIZE', 2)
+    def test_export_ndjson(self):
+        """Test exporting every recipe as one JSON document per line"""
+        for i in range(3):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'Salt {i}')
+            )
+        create_recipe(
+            user=create_user(email='other@example.com', password='pass123')
+        )
+
+        res, body = self._export()
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertIn('recipes.ndjson', res['Content-Disposition'])
+        rows = [json.loads(line) for line in body.splitlines()]
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        self.assertEqual([row['id'] for row in rows],
+                         [recipe.id for recipe in recipes])
+        self.assertEqual(rows[0]['ingredients'][0]['name'], 'Salt 2')
+        self.assertNotIn('image', rows[0])
+
+    def test_export_csv(self):
+        """Test exporting as CSV with names joined in the list columns"""
+        recipe = create_recipe(user=self.user, title='Soup, hot')
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Warm'),
+            Tag.objects.create(user=self.user, name='Quick'),
+        )
+
+        res, body = self._export({'type': 'csv'})
+
+        self.assertTrue(res['Content-Type'].startswith('text/csv'))
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Soup, hot')
+        self.assertEqual(sorted(rows[0]['tags'].split('|')),
+                         ['Quick', 'Warm'])
+        self.assertEqual(rows[0]['ingredients'], '')
+
+    def test_export_csv_escapes_separator(self):
+        """Test names containing the list separator survive a round trip"""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Salt|Pepper'),
+            Tag.objects.create(user=self.user, name='C:\\Dir'),
+        )
+
+        _, body = self._export({'type': 'csv'})
+
+        row = next(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual(sorted(split_csv_list(row['tags'])),
+                         ['C:\\Dir', 'Salt|Pepper'])
+
+    def test_export_ignores_fields_param(self):
+        """Test ?fields= does not drop the relation prefetches"""
+        for i in range(2):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {i}')
+            )
+
+        with self.assertNumQueries(3):
+            _, body = self._export({'fields': 'id'})
+
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(rows[0]['tags'][0]['name'], 'Tag 1')
+
+    def test_export_csv_empty(self):
+        """Test an empty CSV export still has a header row"""
+        res, body = self._export({'type': 'csv'})
+
+        self.assertEqual(body.decode().strip(), ','.join([
+            'id', 'title', 'description', 'time_minutes', 'price', 'link',
+            'tags', 'ingredients',
+        ]))
+
+    def test_export_gzip(self):
+        """Test the export is compressed when the client accepts gzip"""
+        create_recipe(user=self.user)
+
+        res, body = self._export(HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        rows = gzip.decompress(body).splitlines()
+        self.assertEqual(len(rows), 1)
+
+    def test_export_applies_filters(self):
+        """Test the export honours the tag filter"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+        create_recipe(user=self.user)
+
+        res, body = self._export({'tags': tag.id})
+
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [recipe.id])
+
+    def test_export_invalid_type(self):
+        """Test an unknown export type is rejected"""
+        res = self.client.get(EXPORT_URL, {'type': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeMembershipTests(TestCase):
+    """Test adding and removing single tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def _add_tags(self, count):
+        """Link count new tags to the recipe"""
+        self.recipe.tags.add(*[
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+            for i in range(count)
+        ])
+
+    def test_add_tag_by_id(self):
+        """Test linking an existing tag by id"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(tags_url(self.recipe.id), {'id': tag.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'id': tag.id, 'name': 'Vegan'})
+        self.assertEqual(list(self.recipe.tags.all()), [tag])
+
+    def test_add_tag_by_name_creates_tag(self):
+        """Test linking a tag by a name that does not exist yet"""
+        res = self.client.post(tags_url(self.recipe.id), {'name': 'Quick'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        tag = Tag.objects.get(user=self.user, name='Quick')
+        self.assertEqual(list(self.recipe.tags.all()), [tag])
+
+    def test_add_tag_twice_is_idempotent(self):
+        """Test linking an already linked tag keeps a single link"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+
+        res = self.client.post(tags_url(self.recipe.id), {'id': tag.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.recipe.tags.count(), 1)
+
+    def test_add_other_users_tag_not_found(self):
+        """Test another user's tag cannot be linked"""
+        other = create_user(email='other@example.com', password='pass123')
+        tag = Tag.objects.create(user=other, name='Theirs')
+
+        res = self.client.post(tags_url(self.recipe.id), {'id': tag.id})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(self.recipe.tags.exists())
+
+    def test_add_requires_id_or_name(self):
+        """Test a payload naming nothing, or both id and name, is rejected"""
+        url = tags_url(self.recipe.id)
+
+        self.assertEqual(self.client.post(url, {}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.post(url, {'id': 1, 'name': 'x'}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    def test_remove_tag_keeps_other_links(self):
+        """Test unlinking one tag leaves the others in place"""
+        self._add_tags(3)
+        tag = Tag.objects.get(name='Tag 1')
+
+        res = self.client.delete(
+            tags_url(self.recipe.id), {'id': tag.id}, format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            sorted(self.recipe.tags.values_list('name', flat=True)),
+            ['Tag 0', 'Tag 2'],
+        )
+        self.assertTrue(Tag.objects.filter(id=tag.id).exists())
+
+    def test_remove_ingredient_by_name_in_query(self):
+        """Test unlinking an ingredient named in the query string"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.recipe.ingredients.add(salt)
+
+        res = self.client.delete(
+            f'{ingredients_url(self.recipe.id)}?name=Salt'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(self.recipe.ingredients.exists())
+
+    def test_remove_unlinked_not_found(self):
+        """Test unlinking a tag the recipe does not have returns 404"""
+        res = self.client.delete(f'{tags_url(self.recipe.id)}?name=None')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_membership_other_users_recipe_not_found(self):
+        """Test another user's recipe cannot be changed"""
+        other = create_user(email='other@example.com', password='pass123')
+        recipe = create_recipe(user=other)
+
+        res = self.client.post(ingredients_url(recipe.id), {'name': 'Salt'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_membership_queries_do_not_grow_with_links(self):
+        """Test toggling a tag costs the same with many existing links"""
+        tag = Tag.objects.create(user=self.user, name='Toggle')
+        url = tags_url(self.recipe.id)
+
+        def toggle():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(url, {'id': tag.id})
+                self.client.delete(url, {'id': tag.id}, format='json')
+            return len(queries)
+
+        few = toggle()
+        self._add_tags(20)
+
+        self.assertEqual(toggle(), few)
+
+    def test_membership_change_updates_detail(self):
+        """Test a conditional detail request sees the new link"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        self.client.post(tags_url(self.recipe.id), {'id': tag.id})
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegan')
+
+
+class RecipeSparseFieldsTests(TestCase):
+    """Test selecting fields and relations on recipe endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = create_recipe(user=self.user)
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Tag'))
+
+    def test_list_selected_fields_skip_relations(self):
+        """Test unrequested relations are neither returned nor queried"""
+        params = {'fields': 'id,title,time_minutes'}
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(res.data['results'][0]),
+            {'id', 'title', 'time_minutes'},
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"core_recipe"."link"', queries[0]['sql'])
+
+    def test_list_expand_relation(self):
+        """Test expanding a relation adds it to the selected fields"""
+        params = {'fields': 'id,title', 'expand': 'tags'}
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPES_URL, params)
+
+        item = res.data['results'][0]
+        self.assertEqual(set(item), {'id', 'title', 'tags'})
+        self.assertEqual(item['tags'][0]['name'], 'Tag')
+
+    def test_retrieve_selected_fields(self):
+        """Test selecting detail fields on a single recipe"""
+        params = {'fields': 'id,description'}
+        res = self.client.get(detail_url(self.recipe.id), params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data,
+            {'id': self.recipe.id, 'description': self.recipe.description},
+        )
+
+    def test_unknown_fields_are_ignored(self):
+        """Test unknown field names do not cause errors"""
+        params = {'fields': 'id,user,unknown'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [{'id': self.recipe.id}])
+
+    def test_stream_selected_fields(self):
+        """Test the streamed list honours the selected fields"""
+        params = {'fields': 'id,title', 'stream': 1}
+        res = self.client.get(RECIPES_URL, params)
+
+        data = json.loads(b''.join(res.streaming_content))
+        self.assertEqual(
+            data,
+            [{'id': self.recipe.id, 'title': self.recipe.title}],
+        )
+
+
+class RecipeQueryCountTests(TestCase):
+    """Test the number of queries run by the recipe API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _create_recipes_with_relations(self, count):
+        """Create recipes that each have a tag and an ingredient"""
+        recipes = []
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {i}')
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'Ing {i}')
+            )
+            recipes.append(recipe)
+        return recipes
+
+    def test_list_query_count_is_constant(self):
+        """Test listing recipes does not query relations per recipe"""
+        self._create_recipes_with_relations(5)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 5)
+        for item in res.data['results']:
+            self.assertEqual(len(item['tags']), 1)
+            self.assertEqual(len(item['ingredients']), 1)
+
+    def _create_query_count(self, size):
+        """Return the queries used to create a recipe with size relations"""
+        payload = {
+            'title': f'Recipe {size}',
+            'time_minutes': 10,
+            'price': Decimal('5.00'),
+            'tags': [{'name': f'Tag {size} {i}'} for i in range(size)],
+            'ingredients': [
+                {'name': f'Ing {size} {i}'} for i in range(size)
+            ],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['tags']), size)
+        return len(queries)
+
+    def test_create_query_count_independent_of_relations(self):
+        """Test tags and ingredients are resolved as sets on create"""
+        self.assertEqual(
+            self._create_query_count(2),
+            self._create_query_count(15),
+        )
+
+    def _relation_reads(self, queries):
+        """Return how often tags and ingredients were read via a recipe"""
+        return [
+            sum(
+                f'INNER JOIN "core_recipe_{field}"' in query['sql']
+                for query in queries.captured_queries
+            )
+            for field in ('tags', 'ingredients')
+        ]
+
+    def test_create_response_without_requery(self):
+        """Test the create response reuses the resolved relations"""
+        Tag.objects.create(user=self.user, name='Existing')
+        payload = {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': Decimal('5.00'),
+            'tags': [{'name': 'New'}, {'name': 'Existing'}],
+            'ingredients': [{'name': 'Salt'}],
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._relation_reads(queries), [0, 0])
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(
+            res.data['tags'],
+            TagSerializer(recipe.tags.order_by('id'), many=True).data,
+        )
+        self.assertEqual(res.data['ingredients'][0]['name'], 'Salt')
+
+    def test_update_response_without_requery(self):
+        """Test the update response reuses the loaded relations"""
+        recipe = self._create_recipes_with_relations(1)[0]
+        payload = {
+            'title': 'Renamed',
+            'time_minutes': 5,
+            'price': Decimal('1.00'),
+            'tags': [{'name': 'Tag 0'}, {'name': 'Added'}],
+            'ingredients': [{'name': 'Pepper'}],
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.put(detail_url(recipe.id), payload,
+                                  format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # only the prefetch that loads the current links
+        self.assertEqual(self._relation_reads(queries), [1, 1])
+        self.assertEqual(
+            [tag['name'] for tag in res.data['tags']], ['Tag 0', 'Added'],
+        )
+        self.assertEqual(
+            [item['name'] for item in res.data['ingredients']], ['Pepper'],
+        )
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['Added', 'Tag 0'],
+        )
+
+    def test_update_response_matches_retrieve_order(self):
+        """Test the update response lists relations in the read order"""
+        Tag.objects.create(user=self.user, name='Older')
+        recipe = self._create_recipes_with_relations(1)[0]
+        payload = {'tags': [{'name': 'Tag 0'}, {'name': 'Older'}]}
+
+        res = self.client.patch(detail_url(recipe.id), payload,
+                                format='json')
+
+        self.assertEqual(
+            [tag['name'] for tag in res.data['tags']], ['Older', 'Tag 0'],
+        )
+        self.assertEqual(
+            res.data['tags'],
+            self.client.get(detail_url(recipe.id)).data['tags'],
+        )
+        for prefetch in RecipeViewSet()._relation_prefetches():
+            self.assertEqual(prefetch.queryset.query.order_by, ('pk',))
+
+    def test_partial_update_query_count(self):
+        """Test a scalar patch reads each relation once, for the response"""
+        recipe = self._create_recipes_with_relations(1)[0]
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(detail_url(recipe.id), {'title': 'New'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Tag 0')
+        # recipe, tags and ingredients prefetch, then the UPDATE
+        self.assertEqual(len(queries), 4)
+
+    def test_retrieve_query_count(self):
+        """Test retrieving a recipe prefetches its relations"""
+        recipe = self._create_recipes_with_relations(1)[0]
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 1)
+        self.assertEqual(len(res.data['ingredients']), 1)
 
 
 class ImageUploadTests(TestCase):
@@ -0,0 +1,316 @@
+"""
+Tests for the bulk recipe API
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def recipe_payload(index, **params):
+    """Return a payload for one recipe"""
+    payload = {
+        'title': f'Recipe {index}',
+        'time_minutes': 10,
+        'price': '5.00',
+        'tags': [{'name': 'Shared'}, {'name': f'Tag {index}'}],
+        'ingredients': [{'name': f'Ingredient {index}'}],
+    }
+    payload.update(params)
+    return payload
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class BulkCreateTests(TestCase):
+    """Test creating recipes in bulk"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_create_recipes(self):
+        """Test creating several recipes with tags and ingredients"""
+        existing = Tag.objects.create(user=self.user, name='Shared')
+        payload = [recipe_payload(i) for i in range(3)]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        for recipe in recipes:
+            self.assertIn(existing, recipe.tags.all())
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(recipe.ingredients.count(), 1)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(
+            {item['title'] for item in res.data},
+            {'Recipe 0', 'Recipe 1', 'Recipe 2'},
+        )
+
+    def test_bulk_create_query_count_is_constant(self):
+        """Test the number of queries does not grow with the batch"""
+        counts = []
+        for size in (2, 10):
+            payload = [recipe_payload(f'{size}-{i}') for i in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(BULK_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_create_query_count_ignores_fields(self):
+        """Test ?fields= does not add a query per recipe"""
+        counts = []
+        for size in (2, 10):
+            payload = [recipe_payload(f'{size}-{i}') for i in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(
+                    BULK_URL + '?fields=id,title', payload, format='json',
+                )
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_create_duplicate_names_in_one_recipe(self):
+        """Test repeating a tag name in one recipe links it once"""
+        payload = [recipe_payload(0, tags=[{'name': 'A'}, {'name': 'A'}])]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data[0]['tags']), 1)
+
+    @override_settings(RECIPE_BULK_MAX=2)
+    def test_bulk_create_limit(self):
+        """Test more recipes than allowed are rejected"""
+        payload = [recipe_payload(i) for i in range(3)]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_invalid_item_creates_nothing(self):
+        """Test one invalid recipe rejects the whole batch"""
+        payload = [recipe_payload(0), recipe_payload(1, price='abc')]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('price', res.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_requires_list(self):
+        """Test a single object is rejected"""
+        res = self.client.post(BULK_URL, recipe_payload(0), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_invalidates_cached_list(self):
+        """Test recipes created in bulk show up in a cached list"""
+        self.client.get(RECIPES_URL)
+
+        self.client.post(BULK_URL, [recipe_payload(0)], format='json')
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_bulk_create_for_authenticated_user(self):
+        """Test the created recipes belong to the requesting user"""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+
+        payload = [recipe_payload(0, user=other.id)]
+        self.client.post(BULK_URL, payload, format='json')
+
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.user, self.user)
+        self.assertEqual(recipe.price, Decimal('5.00'))
+
+
+class BulkUpdateDeleteTests(TestCase):
+    """Test updating and deleting recipes in bulk"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_update_by_ids(self):
+        """Test setting scalar fields on the listed recipes"""
+        recipe1 = create_recipe(user=self.user)
+        recipe2 = create_recipe(user=self.user)
+        untouched = create_recipe(user=self.user)
+
+        payload = {
+            'ids': [recipe1.id, recipe2.id],
+            'price': '9.50',
+            'time_minutes': 45,
+        }
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 2})
+        self.assertEqual(len(queries), 1)
+        for recipe in (recipe1, recipe2):
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.price, Decimal('9.50'))
+            self.assertEqual(recipe.time_minutes, 45)
+        untouched.refresh_from_db()
+        self.assertEqual(untouched.time_minutes, 10)
+
+    def test_bulk_update_by_tag_filter(self):
+        """Test selecting recipes to update with the tag filter"""
+        tag = Tag.objects.create(user=self.user, name='Sale')
+        tagged = create_recipe(user=self.user)
+        tagged.tags.add(tag)
+        untagged = create_recipe(user=self.user)
+
+        res = self.client.patch(
+            f'{BULK_URL}?tags={tag.id}',
+            {'price': '1.00'},
+            format='json',
+        )
+
+        self.assertEqual(res.data, {'updated': 1})
+        tagged.refresh_from_db()
+        untagged.refresh_from_db()
+        self.assertEqual(tagged.price, Decimal('1.00'))
+        self.assertEqual(untagged.price, Decimal('5.00'))
+
+    def test_bulk_update_scoped_to_user(self):
+        """Test other users' recipes are never updated"""
+        other_recipe = create_recipe(user=self.other)
+
+        payload = {'ids': [other_recipe.id], 'price': '1.00'}
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.data, {'updated': 0})
+        other_recipe.refresh_from_db()
+        self.assertEqual(other_recipe.price, Decimal('5.00'))
+
+    def test_bulk_update_requires_selection(self):
+        """Test updating without ids or a filter is rejected"""
+        create_recipe(user=self.user)
+
+        res = self.client.patch(BULK_URL, {'price': '1.00'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Recipe.objects.get().price, Decimal('5.00'))
+
+    def test_bulk_update_requires_values(self):
+        """Test updating without any field is rejected"""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.patch(BULK_URL, {'ids': [recipe.id]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_invalidates_cached_list(self):
+        """Test a bulk update shows up in a cached list"""
+        recipe = create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+
+        payload = {'ids': [recipe.id], 'title': 'Renamed'}
+        self.client.patch(BULK_URL, payload, format='json')
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'][0]['title'], 'Renamed')
+
+    def test_bulk_delete_by_ids(self):
+        """Test deleting the listed recipes and their links"""
+        tag = Tag.objects.create(user=self.user, name='Old')
+        recipe1 = create_recipe(user=self.user)
+        recipe2 = create_recipe(user=self.user)
+        recipe1.tags.add(tag)
+        kept = create_recipe(user=self.user)
+
+        payload = {'ids': [recipe1.id, recipe2.id]}
+        res = self.client.delete(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'deleted': 2})
+        self.assertEqual(list(Recipe.objects.all()), [kept])
+        self.assertFalse(Recipe.tags.through.objects.exists())
+        self.assertTrue(Tag.objects.filter(id=tag.id).exists())
+
+    def test_bulk_delete_ids_in_query(self):
+        """Test passing the ids to delete as a query parameter"""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.delete(f'{BULK_URL}?ids={recipe.id}')
+
+        self.assertEqual(res.data, {'deleted': 1})
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_delete_by_ingredient_filter(self):
+        """Test selecting recipes to delete with the ingredient filter"""
+        ingredient = Ingredient.objects.create(user=self.user, name='Lard')
+        recipe = create_recipe(user=self.user)
+        recipe.ingredients.add(ingredient)
+        kept = create_recipe(user=self.user)
+
+        res = self.client.delete(f'{BULK_URL}?ingredients={ingredient.id}')
+
+        self.assertEqual(res.data, {'deleted': 1})
+        self.assertEqual(list(Recipe.objects.all()), [kept])
+
+    def test_bulk_delete_scoped_to_user(self):
+        """Test other users' recipes are never deleted"""
+        other_recipe = create_recipe(user=self.other)
+
+        payload = {'ids': [other_recipe.id]}
+        res = self.client.delete(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.data, {'deleted': 0})
+        self.assertTrue(Recipe.objects.filter(id=other_recipe.id).exists())
+
+    def test_bulk_delete_requires_selection(self):
+        """Test deleting without ids or a filter is rejected"""
+        create_recipe(user=self.user)
+
+        res = self.client.delete(BULK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Recipe.objects.exists())
@@ -0,0 +1,50 @@
+"""
+Tests for recipe serializer helpers
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import prefetch_related_objects
+from django.test import TestCase
+
+from core.models import Recipe, Tag
+from recipe.serializers import set_prefetched
+
+
+class SetPrefetchedTests(TestCase):
+    """Test storing objects as a prefetched relation"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+        self.tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('B', 'A')
+        ]
+
+    def test_relation_read_without_queries(self):
+        """Test the manager returns the stored objects without a query"""
+        set_prefetched(self.recipe, 'tags', self.tags)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(list(self.recipe.tags.all()), self.tags)
+            prefetch_related_objects([self.recipe], 'tags')
+
+    def test_add_drops_stored_objects(self):
+        """Test changing the relation discards the stored objects"""
+        set_prefetched(self.recipe, 'tags', self.tags[:1])
+
+        self.recipe.tags.add(*self.tags)
+
+        self.assertEqual(
+            {tag.name for tag in self.recipe.tags.all()},
+            {'A', 'B'},
+        )
@@ -90,6 +90,18 @@ class PrivateTagsApiTests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_to_existing_name_error(self):
+        """Test renaming a tag to a name already in use returns an error"""
+        Tag.objects.create(user=self.user, name='Brunch')
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+
+        url = details_url(tag.id)
+        res = self.client.patch(url, {'name': 'Brunch'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Breakfast')
+
     def test_delete_tag(self):
         """Test deleting a tag"""
         tag = Tag.objects.create(user=self.user, name='Lunch')
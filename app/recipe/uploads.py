@@ -0,0 +1,110 @@
+"""
+Resumable chunked uploads of recipe images.
+
+A client opens an upload with the total size, then sends the bytes in
+order, one PATCH per chunk with an Upload-Offset header. Chunks are
+appended to a partial file outside MEDIA_ROOT, so a slow client holds a
+worker for one chunk at a time, and an interrupted upload resumes at the
+stored offset. The image header is checked as soon as it has arrived,
+and must lie within the first IMAGE_UPLOAD_HEADER_BYTES of the file.
+"""
+import datetime
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from core.models import ImageUpload
+from recipe.images import (
+    IMAGE_EXTENSIONS,
+    IncompleteImageHeader,
+    sniff_image,
+    verify_image,
+)
+
+
+def partial_path(upload):
+    """Return the path of the partial file of an upload"""
+    return os.path.join(settings.IMAGE_UPLOAD_TEMP_DIR, upload.pk.hex)
+
+
+def discard(upload):
+    """Delete an upload and its partial file"""
+    path = partial_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+    upload.delete()
+
+
+def discard_expired():
+    """Delete uploads abandoned for longer than IMAGE_UPLOAD_EXPIRY"""
+    cutoff = timezone.now() - datetime.timedelta(
+        seconds=settings.IMAGE_UPLOAD_EXPIRY,
+    )
+    for upload in ImageUpload.objects.filter(created_at__lt=cutoff):
+        discard(upload)
+
+
+def check_header(upload):
+    """Validate the image header once it has arrived and record the format
+
+    Until IMAGE_UPLOAD_HEADER_BYTES, or the whole file, have arrived, a
+    header cut short by the end of the received bytes leaves the format
+    unset so that the next chunk can complete it. Raises ValueError when
+    the file is not an accepted image within IMAGE_UPLOAD_MAX_PIXELS.
+    """
+    limit = min(upload.size, settings.IMAGE_UPLOAD_HEADER_BYTES)
+    with open(partial_path(upload), 'rb') as partial:
+        head = partial.read(limit)
+    try:
+        image_format, (width, height) = sniff_image(head)
+    except IncompleteImageHeader:
+        if upload.offset < limit:
+            return
+        raise
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValueError(
+            f'Image is {width}x{height}, over the '
+            f'{settings.IMAGE_UPLOAD_MAX_PIXELS} pixel limit.'
+        )
+    upload.image_format = image_format
+    upload.save(update_fields=['image_format'])
+
+
+def append_chunk(upload, chunk):
+    """Write a chunk at the upload's offset and advance it
+
+    Anything past the offset, left by a request that failed before its
+    offset was saved, is overwritten.
+    """
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'r+b' if upload.offset else 'wb') as partial:
+        partial.seek(upload.offset)
+        partial.write(chunk)
+        partial.truncate()
+    upload.offset += len(chunk)
+    upload.save(update_fields=['offset'])
+
+
+def finish(upload):
+    """Verify the complete file and store it as the recipe's image
+
+    Returns the recipe. Raises ValueError when the file is not a valid
+    image.
+    """
+    path = partial_path(upload)
+    verify_image(path)
+
+    recipe = upload.recipe
+    with open(path, 'rb') as partial:
+        recipe.image.save(
+            f'upload{IMAGE_EXTENSIONS[upload.image_format]}',
+            File(partial),
+            save=False,
+        )
+    recipe.image_variants = {}
+    recipe.save(update_fields=['image', 'image_variants', 'updated_at'])
+    discard(upload)
+    return recipe
@@ -1,24 +1,82 @@
 """
 views for the recipe API.
 """
+import os
+import posixpath
+
 from drf_spectacular.utils import (
     extend_schema,
     extend_schema_view,
     OpenApiParameter,
     OpenApiTypes,
 )
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response,
+    patch_vary_headers,
+    quote_etag,
+)
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import compress_sequence
 from rest_framework import (
     viewsets,
     mixins,
     status,
 )
 from rest_framework.decorators import action
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.views import APIView
+
+from core.media import serve_file
+from core.models import ImageUpload, Recipe, Tag, Ingredient
+from core.storage import content_hash, recipe_image_storage
+from recipe import resizing, serializers, uploads
+from recipe.cache import invalidate_user
+from recipe.idempotency import idempotent
+from recipe.images import RESIZE_FORMATS
+from recipe.mixins import CachedListMixin, ConditionalGetMixin
+from recipe.pagination import RecipeCursorPagination
+from recipe.pipeline import schedule_variants
+from recipe.signals import release_image
+from recipe.streaming import (
+    iter_chunks,
+    stream_csv,
+    stream_json_list,
+    stream_ndjson,
+)
+
 
-from core.models import Recipe, Tag, Ingredient
-from recipe import serializers
+EXPORT_FIELDS = [
+    'id', 'title', 'description', 'time_minutes', 'price', 'link',
+    'tags', 'ingredients',
+]
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+MEMBERSHIP_ACTIONS = {
+    'add_tag', 'remove_tag', 'add_ingredient', 'remove_ingredient',
+}
+re_accepts_gzip = _lazy_re_compile(r'\bgzip\b')
+UPLOAD_CHUNK_CONTENT_TYPES = (
+    'application/offset+octet-stream',
+    'application/octet-stream',
+)
+RESIZE_CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'webp': 'image/webp',
+}
+UUID_PATTERN = (
+    r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+)
 
 
 @extend_schema_view(
@@ -34,38 +92,170 @@ from recipe import serializers
                 type=OpenApiTypes.STR,
                 description='Comma-separated list of ingredient IDs to filter',
             ),
+            OpenApiParameter(
+                name='stream',
+                type=OpenApiTypes.INT,
+                enum=[0, 1],
+                description=(
+                    'Stream every matching recipe as one unpaginated JSON '
+                    'array'
+                ),
+            ),
+            OpenApiParameter(
+                name='fields',
+                type=OpenApiTypes.STR,
+                description='Comma-separated list of fields to return',
+            ),
+            OpenApiParameter(
+                name='expand',
+                type=OpenApiTypes.STR,
+                description=(
+                    'Comma-separated list of relations to include when '
+                    'fields is given'
+                ),
+            ),
+            OpenApiParameter(
+                name='match',
+                type=OpenApiTypes.STR,
+                enum=['any', 'all'],
+                description=(
+                    'Return recipes matching any (default) or all of the '
+                    'listed tags and ingredients'
+                ),
+            ),
         ]
-    )
+    ),
+    retrieve=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='fields',
+                type=OpenApiTypes.STR,
+                description='Comma-separated list of fields to return',
+            ),
+            OpenApiParameter(
+                name='expand',
+                type=OpenApiTypes.STR,
+                description=(
+                    'Comma-separated list of relations to include when '
+                    'fields is given'
+                ),
+            ),
+        ]
+    ),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin,
+    CachedListMixin,
+    viewsets.ModelViewSet
+):
     """view for managing recipe APIs"""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
 
     def _params_to_ints(self, qs):
         """Convert a list of string IDs to a list of integers"""
         return [int(str_id) for str_id in qs.split(',')] if qs else []
 
+    def _requested_fields(self):
+        """Return the fields selected with ?fields= and ?expand=, or None"""
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+
+        expand = self.request.query_params.get('expand', '')
+        requested = set(fields.split(',')) | set(expand.split(','))
+        return requested & set(self.get_serializer_class().Meta.fields)
+
+    def _relation_prefetches(self, fields=None):
+        """Return prefetches for the relations among fields, or for all"""
+        prefetches = [
+            Prefetch(
+                'tags',
+                queryset=Tag.objects.only('id', 'name').order_by('pk'),
+            ),
+            Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.only('id', 'name').order_by('pk'),
+            ),
+        ]
+        if fields is None:
+            return prefetches
+        return [p for p in prefetches if p.prefetch_to in fields]
+
+    def _with_relations(self, queryset):
+        """Prefetch the requested relations and defer unused columns"""
+        fields = self._requested_fields()
+        if fields is not None:
+            columns = [
+                name for name in fields
+                if not Recipe._meta.get_field(name).many_to_many
+            ]
+            queryset = queryset.only('id', *columns)
+
+        return queryset.prefetch_related(*self._relation_prefetches(fields))
+
+    def _match_all(self):
+        """Return True when every listed tag/ingredient must match"""
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': 'Must be "any" or "all".'})
+        return match == 'all'
+
+    def _stream_requested(self):
+        """Return True when the unpaginated stream is requested"""
+        stream = self.request.query_params.get('stream', '0')
+        if stream not in ('0', '1'):
+            raise ValidationError({'stream': 'Must be 0 or 1.'})
+        return stream == '1'
+
+    def _filter_related(self, queryset, through, column, ids, match_all):
+        """Filter recipes by linked ids with a through-table semi-join"""
+        links = through.objects.filter(**{f'{column}__in': ids})
+        if match_all:
+            matching = links.values('recipe_id').annotate(
+                matched=Count(column)
+            ).filter(matched=len(set(ids))).values('recipe_id')
+            return queryset.filter(id__in=matching)
+
+        return queryset.filter(Exists(links.filter(recipe_id=OuterRef('pk'))))
+
     def get_queryset(self):
         """Retrieve the recipes for the authenticated user"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match_all = self._match_all()
 
         queryset = self.queryset.filter(user=self.request.user)
 
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = self._filter_related(
+                queryset, Recipe.tags.through, 'tag_id', tag_ids, match_all
+            )
 
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = self._filter_related(
+                queryset,
+                Recipe.ingredients.through,
+                'ingredient_id',
+                ingredient_ids,
+                match_all,
+            )
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+        queryset = queryset.order_by('-id')
+
+        if self.action in ('list', 'retrieve'):
+            queryset = self._with_relations(queryset)
+        elif self.action in ('update', 'partial_update'):
+            queryset = queryset.prefetch_related(
+                *self._relation_prefetches()
+            )
+
+        return queryset
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -73,24 +263,483 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'bulk_update':
+            return serializers.RecipeBulkUpdateSerializer
+        elif self.action == 'bulk_destroy':
+            return serializers.RecipeBulkSelectSerializer
+        elif self.action in MEMBERSHIP_ACTIONS:
+            return serializers.RecipeMembershipSerializer
+        elif self.action in ('start_image_upload', 'image_upload'):
+            return serializers.ImageUploadSerializer
 
         return self.serializer_class
 
+    def get_serializer(self, *args, **kwargs):
+        """Limit read serializers to the requested fields"""
+        if self.action in ('list', 'retrieve'):
+            kwargs.setdefault('fields', self._requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        """List recipes, streaming them when requested"""
+        if self._stream_requested():
+            return self._stream_list()
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a recipe, honouring If-None-Match"""
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+    def _stream_list(self):
+        """Stream all matching recipes without materializing the list"""
+        queryset = self.filter_queryset(self.get_queryset())
+        chunks = iter_chunks(
+            queryset, self._relation_prefetches(self._requested_fields()),
+        )
+        return StreamingHttpResponse(
+            stream_json_list(
+                chunks,
+                lambda chunk: self.get_serializer(chunk, many=True).data,
+            ),
+            content_type='application/json',
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='type',
+                type=OpenApiTypes.STR,
+                enum=sorted(EXPORT_CONTENT_TYPES),
+                description='Export as NDJSON (default) or CSV',
+            ),
+            OpenApiParameter(
+                name='tags',
+                type=OpenApiTypes.STR,
+                description='Comma-separated list of tag IDs to filter',
+            ),
+            OpenApiParameter(
+                name='ingredients',
+                type=OpenApiTypes.STR,
+                description='Comma-separated list of ingredient IDs to filter',
+            ),
+        ],
+        responses={200: OpenApiTypes.BINARY},
+    )
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream every recipe of the user as NDJSON or CSV
+
+        Rows are read through a server-side cursor and serialized a chunk
+        at a time. The body is gzipped when the client accepts it.
+        """
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in EXPORT_CONTENT_TYPES:
+            raise ValidationError({'type': 'Must be "ndjson" or "csv".'})
+
+        # EXPORT_FIELDS always include both relations, whatever ?fields=
+        chunks = iter_chunks(self.get_queryset(), self._relation_prefetches())
+
+        def serialize(chunk):
+            return self.get_serializer(
+                chunk, many=True, fields=EXPORT_FIELDS,
+            ).data
+
+        if export_type == 'csv':
+            content = stream_csv(chunks, serialize, EXPORT_FIELDS)
+        else:
+            content = stream_ndjson(chunks, serialize)
+
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        gzipped = re_accepts_gzip.search(accept_encoding)
+        if gzipped:
+            content = compress_sequence(content)
+
+        response = StreamingHttpResponse(
+            content,
+            content_type=EXPORT_CONTENT_TYPES[export_type],
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{export_type}"'
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def perform_content_negotiation(self, request, force=False):
+        """Let resized image requests send image-only Accept headers"""
+        force = force or self.action == 'resized_image'
+        return super().perform_content_negotiation(request, force=force)
+
+    def update(self, request, *args, **kwargs):
+        """Update a recipe, serializing the relations it already holds
+
+        Unlike UpdateModelMixin, the prefetch cache is kept: the update
+        loaded the relations and the serializer refreshes whatever it
+        changed, so the response needs no further queries.
+        """
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        serializer = self.get_serializer(
+            instance, data=request.data, partial=partial,
+        )
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        return Response(serializer.data)
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        """Create a recipe, replaying the response for a repeated key"""
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create many recipes in a constant number of queries"""
+        if not isinstance(request.data, list):
+            raise ValidationError({'non_field_errors': [
+                'Expected a list of recipes.'
+            ]})
+        if len(request.data) > settings.RECIPE_BULK_MAX:
+            raise ValidationError({'non_field_errors': [
+                f'At most {settings.RECIPE_BULK_MAX} recipes are allowed.'
+            ]})
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.save(user=request.user)
+
+        # The response serializes every field, so ?fields= must not defer
+        # columns here
+        queryset = Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).order_by('-id').prefetch_related(*self._relation_prefetches())
+        return Response(
+            self.get_serializer(queryset, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    def _bulk_selection(self, ids):
+        """Return the user's recipes picked by ids or the list filters"""
+        params = self.request.query_params
+        if ids is None and not (
+            params.get('tags') or params.get('ingredients')
+        ):
+            raise ValidationError({'ids': [
+                'Provide ids or a tags/ingredients filter.'
+            ]})
+
+        queryset = self.get_queryset()
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        return queryset
+
+    @bulk.mapping.patch
+    def bulk_update(self, request):
+        """Set scalar fields on many recipes with a single UPDATE"""
+        serializer = self.get_serializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        values = dict(serializer.validated_data)
+        queryset = self._bulk_selection(values.pop('ids', None))
+
+        updated = queryset.update(updated_at=timezone.now(), **values)
+
+        # queryset updates send no model signals
+        invalidate_user(request.user.pk)
+        return Response({'updated': updated})
+
+    @bulk.mapping.delete
+    def bulk_destroy(self, request):
+        """Delete many recipes and their links as set operations"""
+        data = request.data or {}
+        if 'ids' not in data and request.query_params.get('ids'):
+            data = {'ids': request.query_params['ids'].split(',')}
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        queryset = self._bulk_selection(serializer.validated_data.get('ids'))
+
+        with transaction.atomic():
+            deleted = queryset.only('id', 'user', 'image').delete()[1].get(
+                Recipe._meta.label, 0
+            )
+
+        return Response({'deleted': deleted})
+
+    def _membership(self, request):
+        """Return the validated id or name of the tag/ingredient to link"""
+        data = request.data or request.query_params
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def _touch(self, recipe):
+        """Mark a recipe changed after a write that sends no signals"""
+        Recipe.objects.filter(pk=recipe.pk).update(updated_at=timezone.now())
+        invalidate_user(self.request.user.pk)
+
+    def _add_member(self, request, field_name, model, serializer_class):
+        """Link one tag or ingredient to the recipe by id or name"""
+        recipe = self.get_object()
+        target = self._membership(request)
+        if 'id' in target:
+            member = model.objects.filter(
+                user=request.user, id=target['id'],
+            ).first()
+            if member is None:
+                raise Http404
+        else:
+            member = model.objects.get_or_create_by_names(
+                request.user, [target['name']],
+            )[0]
+
+        through = getattr(Recipe, field_name).through
+        through.objects.bulk_create(
+            [through(recipe_id=recipe.pk, **{
+                f'{model._meta.model_name}_id': member.pk,
+            })],
+            ignore_conflicts=True,
+        )
+        self._touch(recipe)
+        return Response(serializer_class(member).data)
+
+    def _remove_member(self, request, field_name, model):
+        """Unlink one tag or ingredient from the recipe by id or name"""
+        recipe = self.get_object()
+        target = self._membership(request)
+        column = model._meta.model_name
+        links = getattr(Recipe, field_name).through.objects.filter(
+            recipe_id=recipe.pk,
+        )
+        if 'id' in target:
+            links = links.filter(**{f'{column}_id': target['id']})
+        else:
+            links = links.filter(**{f'{column}__name': target['name']})
+
+        if not links.delete()[0]:
+            raise Http404
+        self._touch(recipe)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(methods=['POST'], detail=True, url_path='tags')
+    def add_tag(self, request, pk=None):
+        """Add one tag to a recipe"""
+        return self._add_member(
+            request, 'tags', Tag, serializers.TagSerializer,
+        )
+
+    @add_tag.mapping.delete
+    def remove_tag(self, request, pk=None):
+        """Remove one tag from a recipe"""
+        return self._remove_member(request, 'tags', Tag)
+
+    @action(methods=['POST'], detail=True, url_path='ingredients')
+    def add_ingredient(self, request, pk=None):
+        """Add one ingredient to a recipe"""
+        return self._add_member(
+            request, 'ingredients', Ingredient,
+            serializers.IngredientSerializer,
+        )
+
+    @add_ingredient.mapping.delete
+    def remove_ingredient(self, request, pk=None):
+        """Remove one ingredient from a recipe"""
+        return self._remove_member(request, 'ingredients', Ingredient)
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
+    @idempotent
     def upload_image(self, request, pk=None):
-        """Upload an image to a recipe"""
+        """Upload an image to a recipe and queue its resized variants"""
         recipe = self.get_object()
+        previous = recipe.image.name
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            schedule_variants(serializer.save(image_variants={}))
+            release_image(previous)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='width',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.PATH,
+            ),
+            OpenApiParameter(
+                name='height',
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.PATH,
+            ),
+            OpenApiParameter(
+                name='image_format',
+                type=OpenApiTypes.STR,
+                location=OpenApiParameter.PATH,
+                enum=sorted(RESIZE_CONTENT_TYPES),
+            ),
+        ],
+        responses={200: OpenApiTypes.BINARY},
+        operation_id='recipe_recipes_image_resized',
+    )
+    @action(
+        methods=['GET'],
+        detail=True,
+        url_path=(
+            r'image/(?P<width>\d+)x(?P<height>\d+)'
+            r'\.(?P<image_format>jpg|png|webp)'
+        ),
+    )
+    def resized_image(self, request, pk=None, width=None, height=None,
+                      image_format=None):
+        """Serve the recipe image scaled to fit an allowed size
+
+        Resized files are rendered on first request and served from a
+        disk cache afterwards.
+        """
+        width, height = int(width), int(height)
+        if (width, height) not in settings.IMAGE_RESIZE_SIZES:
+            raise ValidationError({'size': [
+                'Must be one of ' + ', '.join(
+                    f'{w}x{h}' for w, h in settings.IMAGE_RESIZE_SIZES
+                ) + '.'
+            ]})
+        if image_format not in RESIZE_FORMATS:
+            raise Http404
+
+        recipe = self.get_object()
+        if not recipe.image:
+            raise Http404
+
+        stem = os.path.splitext(os.path.basename(recipe.image.name))[0]
+        etag = quote_etag(f'{stem}-{width}x{height}.{image_format}')
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = FileResponse(
+                resizing.get_resized(
+                    recipe.image.path,
+                    recipe.image.name,
+                    width,
+                    height,
+                    image_format,
+                ),
+                content_type=RESIZE_CONTENT_TYPES[image_format],
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=3600'
+        return response
+
+    def _upload_response(self, upload, status_code=status.HTTP_200_OK):
+        """Return the state of a chunked upload"""
+        return Response(
+            self.get_serializer(upload).data,
+            status=status_code,
+            headers={'Upload-Offset': str(upload.offset)},
+        )
+
+    def _get_upload(self, upload_id, lock=False):
+        """Return the recipe's unexpired upload or raise Http404"""
+        uploads.discard_expired()
+        queryset = ImageUpload.objects.filter(
+            recipe=self.get_object(), pk=upload_id,
+        ).select_related('recipe')
+        if lock:
+            queryset = queryset.select_for_update(of=('self',))
+        upload = queryset.first()
+        if upload is None:
+            raise Http404
+        return upload
+
+    @action(methods=['POST'], detail=True, url_path='image-uploads')
+    def start_image_upload(self, request, pk=None):
+        """Open a resumable chunked upload of the recipe image"""
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        uploads.discard_expired()
+        upload = serializer.save(recipe=recipe)
+        return self._upload_response(upload, status.HTTP_201_CREATED)
+
+    @extend_schema(parameters=[
+        OpenApiParameter(
+            name='upload_id',
+            type=OpenApiTypes.UUID,
+            location=OpenApiParameter.PATH,
+        ),
+    ])
+    @action(
+        methods=['GET', 'PATCH', 'DELETE'],
+        detail=True,
+        url_path=rf'image-uploads/(?P<upload_id>{UUID_PATTERN})',
+    )
+    def image_upload(self, request, pk=None, upload_id=None):
+        """Report, append a chunk to or abandon a chunked upload
+
+        GET returns the offset to resume from.
+        """
+        if request.method == 'PATCH':
+            return self._append_image_upload(request, upload_id)
+        elif request.method == 'DELETE':
+            uploads.discard(self._get_upload(upload_id))
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        return self._upload_response(self._get_upload(upload_id))
+
+    def _append_image_upload(self, request, upload_id):
+        """Append one chunk to an upload, storing the image once complete
+
+        The image header is checked once enough bytes have arrived, so
+        a small first chunk is fine. The upload is discarded only when
+        the file is definitely rejected.
+        """
+        content_type = request.META.get('CONTENT_TYPE', '').split(';')[0]
+        if content_type not in UPLOAD_CHUNK_CONTENT_TYPES:
+            raise UnsupportedMediaType(content_type)
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            raise ValidationError(
+                {'detail': 'Upload-Offset and Content-Length are required.'}
+            )
+        if length > settings.IMAGE_UPLOAD_MAX_CHUNK_BYTES:
+            return Response(
+                {'detail': 'Chunk is too large.'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        with transaction.atomic():
+            upload = self._get_upload(upload_id, lock=True)
+            if offset != upload.offset:
+                return self._upload_response(upload, status.HTTP_409_CONFLICT)
+            if offset + length > upload.size:
+                raise ValidationError(
+                    {'detail': 'Chunk goes past the declared size.'}
+                )
+
+            chunk = request.read(length)
+            try:
+                uploads.append_chunk(upload, chunk)
+                if not upload.image_format:
+                    uploads.check_header(upload)
+                if upload.offset < upload.size:
+                    return self._upload_response(upload)
+                previous = upload.recipe.image.name
+                recipe = uploads.finish(upload)
+            except ValueError as exc:
+                uploads.discard(upload)
+                return Response(
+                    {'detail': str(exc)},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        schedule_variants(recipe)
+        release_image(previous)
+        return Response(serializers.RecipeImageSerializer(
+            recipe, context=self.get_serializer_context(),
+        ).data)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -105,6 +754,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
 )
 class BaseRecipeAttrViewSet(
+    ConditionalGetMixin,
+    CachedListMixin,
     mixins.UpdateModelMixin,
     mixins.DestroyModelMixin,
     mixins.ListModelMixin,
@@ -121,10 +772,14 @@ class BaseRecipeAttrViewSet(
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            through = queryset.model.recipe_set.through
+            column = f'{queryset.model._meta.model_name}_id'
+            queryset = queryset.filter(
+                Exists(through.objects.filter(**{column: OuterRef('pk')}))
+            )
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by('-name')
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
@@ -137,3 +792,50 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database"""
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+
+
+class RecipeMediaView(APIView):
+    """Serve stored recipe images and their variants to their owner"""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        """Let image requests send image-only Accept headers"""
+        return super().perform_content_negotiation(request, force=True)
+
+    def get_recipe(self, name):
+        """Return the user's recipe whose image or variant has the name"""
+        directory, basename = posixpath.split(name)
+        stem = posixpath.join(directory, basename.split('.', 1)[0])
+        recipes = Recipe.objects.filter(
+            user=self.request.user,
+            image__startswith=f'{stem}.',
+        ).only('image', 'image_variants')
+        for recipe in recipes:
+            if name == recipe.image.name or \
+                    name in recipe.image_variants.values():
+                return recipe
+        raise Http404
+
+    @extend_schema(exclude=True)
+    def get(self, request, path):
+        """Serve a file, cached for good when it is named by its hash
+
+        Content-addressed names never change content, so they get a
+        strong ETag from the name and an immutable Cache-Control. Older
+        files are validated against their modification time and size.
+        """
+        self.get_recipe(path)
+        if not recipe_image_storage.exists(path):
+            raise Http404
+
+        if content_hash(path):
+            etag = quote_etag(posixpath.basename(path))
+            cache_control = 'private, max-age=31536000, immutable'
+        else:
+            stat = os.stat(recipe_image_storage.path(path))
+            etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+            cache_control = 'private, no-cache'
+        return serve_file(
+            request, recipe_image_storage, path, etag, cache_control,
+        )
@@ -4,6 +4,7 @@ set -e
 
 python manage.py wait_for_db
 python manage.py collectstatic --noinput
+python manage.py build_schema
 python manage.py migrate
 
 gunicorn app.wsgi:application --bind 0.0.0.0:8000
\ No newline at end of file